@@ -0,0 +1,127 @@
+"""Run the benchmarks, printing results as JSON.
+
+    python -m benchmarks --out results.json
+    python -m benchmarks --store python sqlite postgres --postgres-url postgresql://...
+    python -m benchmarks --compare before.json after.json
+
+Each workload/store pair is run in a fresh process so that peak RSS is per pair.
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+from importlib import metadata
+from typing import Any
+
+from tabulate import tabulate
+
+from benchmarks import harness
+
+COMPARED = ["rows_per_sec", "latency_ms_p50", "latency_ms_p99", "peak_rss_bytes"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--workload", nargs="+", default=harness.WORKLOADS)
+    parser.add_argument("--store", nargs="+", default=["python", "sqlite"])
+    parser.add_argument("--postgres-url", default=None)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write JSON here too")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        before, after = (json.load(open(p)) for p in args.compare)
+        print(compare(before, after))
+        return
+
+    for name in args.workload:
+        if name not in harness.WORKLOADS:
+            parser.error(f"unknown workload: {name}")
+    for name in args.store:
+        if name not in harness.STORES:
+            parser.error(f"unknown store: {name}")
+
+    results = list[dict[str, Any]]()
+    for workload in args.workload:
+        for store in args.store:
+            print(f"running {workload} on {store}", file=sys.stderr)
+            results.append(
+                _run_in_fresh_process(
+                    workload, store, args.scale, args.seed, args.postgres_url
+                )
+            )
+
+    out = json.dumps(
+        {
+            "meta": _meta(args.scale, args.seed),
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+    print(out)
+
+
+def compare(before: dict[str, Any], after: dict[str, Any]) -> str:
+    """Table of percentage changes per workload/store for the headline metrics."""
+
+    def key(r: dict[str, Any]) -> tuple[str, str]:
+        return r["workload"], r["store"]
+
+    befores = {key(r): r for r in before["results"]}
+    table = list[list[Any]]()
+    for r in after["results"]:
+        if key(r) not in befores:
+            continue
+        b = befores[key(r)]
+        row: list[Any] = [r["workload"], r["store"]]
+        for metric in COMPARED:
+            row.append(
+                f"{(r[metric] / b[metric] - 1) * 100:+.1f}%" if b[metric] else ""
+            )
+        table.append(row)
+    return tabulate(table, ["workload", "store"] + COMPARED)  # type: ignore[no-any-return]
+
+
+def _run_in_fresh_process(
+    workload: str, store: str, scale: float, seed: int, postgres_url: str | None
+) -> dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+        future = executor.submit(
+            harness.run, workload, store, scale, seed, postgres_url
+        )
+        return future.result()
+
+
+def _meta(scale: float, seed: int) -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "stepping": metadata.version("stepping"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "seed": seed,
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Users write comments on posts, keep the html for each comment up to date.
+
+As per docs-md/examples/comments.md, when a user changes their name, the html
+of all their comments is updated.
+"""
+from __future__ import annotations
+
+import html
+import random
+
+import stepping as st
+from benchmarks.harness import Tick, Workload, tick
+
+
+class User(st.Data):
+    user_id: int
+    name: str
+
+
+class Comment(st.Data):
+    comment_id: int
+    post_id: int
+    user_id: int
+    text: str
+
+
+class CommentHtml(st.Data):
+    comment_id: int
+    post_id: int
+    html: str
+
+
+def to_html(p: st.Pair[Comment, User]) -> CommentHtml:
+    comment, user = p.left, p.right
+    return CommentHtml(
+        comment_id=comment.comment_id,
+        post_id=comment.post_id,
+        html=f"<p><b>{html.escape(user.name)}</b>: {html.escape(comment.text)}</p>",
+    )
+
+
+index_post = st.Index.pick(CommentHtml, lambda c: c.post_id)
+html_cache = st.Cache[CommentHtml]()
+
+
+def query(users: st.ZSet[User], comments: st.ZSet[Comment]) -> st.ZSet[CommentHtml]:
+    joined = st.join(
+        comments,
+        users,
+        on_left=st.Index.pick(Comment, lambda c: c.user_id),
+        on_right=st.Index.pick(User, lambda u: u.user_id),
+    )
+    htmls = st.map(joined, f=to_html)
+    _ = html_cache[htmls](lambda h: st.integrate_indexed(h, indexes=(index_post,)))
+    return htmls
+
+
+def make(seed: int, scale: float) -> Workload:
+    rng = random.Random(seed)
+    n_users = max(1, int(50 * scale))
+    n_posts = max(1, int(20 * scale))
+    n_ticks = max(1, int(100 * scale))
+
+    users = [User(user_id=i, name=f"user-{i}") for i in range(n_users)]
+    ticks = list[Tick]()
+    for i in range(n_ticks):
+        if i % 10 == 9:
+            # Renaming a user touches every comment they've written
+            j = rng.randrange(n_users)
+            renamed = User(user_id=j, name=f"user-{j}-{i}")
+            ticks.append(tick(2, 0, insert=[renamed], remove=[users[j]]))
+            users[j] = renamed
+        else:
+            comments = [
+                Comment(
+                    comment_id=i * 10 + k,
+                    post_id=rng.randrange(n_posts),
+                    user_id=rng.randrange(n_users),
+                    text=f"comment {i * 10 + k} " + "lorem ipsum " * rng.randrange(8),
+                )
+                for k in range(10)
+            ]
+            ticks.append(tick(2, 1, insert=comments))
+
+    return Workload(query=query, setup=[tick(2, 0, insert=users)], ticks=ticks)
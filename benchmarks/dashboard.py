@@ -0,0 +1,83 @@
+"""Count events per kind per day, for graphing on a dashboard.
+
+As per docs-md/examples/dashboard.md.
+"""
+from __future__ import annotations
+
+import random
+from datetime import date, datetime, timedelta
+
+import stepping as st
+from benchmarks.harness import Tick, Workload, tick
+
+KINDS = ["signup", "login", "purchase", "refund", "logout"]
+
+
+class Event(st.Data):
+    event_id: int
+    kind: str
+    timestamp: datetime
+
+
+class EventDate(st.Data):
+    kind: str
+    date: date
+
+
+class DailyCount(st.Data):
+    kind: str
+    date: date
+    count: int
+
+
+def to_event_date(e: Event) -> EventDate:
+    return EventDate(kind=e.kind, date=e.timestamp.date())
+
+
+def pick_one(e: EventDate) -> int:
+    return 1
+
+
+def to_daily_count(p: st.Pair[int, tuple[str, date]]) -> DailyCount:
+    kind, date = p.right
+    return DailyCount(kind=kind, date=date, count=p.left)
+
+
+index_date = st.Index.pick(DailyCount, lambda d: d.date)
+daily_cache = st.Cache[DailyCount]()
+
+
+def query(events: st.ZSet[Event]) -> st.ZSet[DailyCount]:
+    event_dates = st.map(events, f=to_event_date)
+    counted = st.group_reduce_flatten(
+        event_dates,
+        by=st.Index.pick(EventDate, lambda e: (e.kind, e.date)),
+        zero=int,
+        pick_value=pick_one,
+    )
+    daily = st.map(counted, f=to_daily_count)
+    _ = daily_cache[daily](lambda d: st.integrate_indexed(d, indexes=(index_date,)))
+    return daily
+
+
+def make(seed: int, scale: float) -> Workload:
+    rng = random.Random(seed)
+    n_ticks = max(1, int(100 * scale))
+    batch_size = 50
+    start = datetime(2023, 1, 1)
+
+    ticks = list[Tick]()
+    for i in range(n_ticks):
+        # Events mostly arrive in order, with a few stragglers
+        now = start + timedelta(hours=i)
+        events = [
+            Event(
+                event_id=i * batch_size + k,
+                kind=rng.choice(KINDS),
+                timestamp=now - timedelta(minutes=rng.choice([0, 0, 0, 5, 60 * 24])),
+            )
+            for k in range(batch_size)
+        ]
+        ticks.append(tick(1, 0, insert=events))
+
+    return Workload(query=query, setup=[], ticks=ticks)
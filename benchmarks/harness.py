@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import gc
+import importlib
+import pathlib
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterator
+
+import stepping as st
+from stepping.store import table_name
+
+WORKLOADS = ["meter_reads", "comments", "type_checker", "dashboard"]
+STORES = [
+    "python",
+    "sqlite",
+    "sqlite-write-behind",
+    "postgres",
+    "postgres-write-behind",
+]
+
+Tick = tuple[st.ZSetPython[Any], ...]
+
+
+@dataclass
+class Workload:
+    query: Callable[..., Any]
+    setup: list[Tick]  # not timed, eg: inserting users before their reads
+    ticks: list[Tick]
+
+
+def tick(n_inputs: int, i: int, insert: Any = (), remove: Any = ()) -> Tick:
+    """Make the inputs for one iteration, with changes to input `i` only."""
+    changes = st.ZSetPython[Any]({**{v: 1 for v in insert}, **{v: -1 for v in remove}})
+    return tuple(changes if i == j else st.ZSetPython[Any]() for j in range(n_inputs))
+
+
+@dataclass
+class Result:
+    workload: str
+    store: str
+    ticks: int
+    rows: int
+    secs: float
+    rows_per_sec: float
+    latency_ms_p50: float
+    latency_ms_p90: float
+    latency_ms_p99: float
+    latency_ms_max: float
+    peak_rss_bytes: int
+    state_rows: int
+    state_bytes: int
+    state_index_bytes: int
+    disk_bytes: int | None
+
+
+def run(
+    workload_name: str,
+    store_name: str,
+    scale: float,
+    seed: int,
+    postgres_url: str | None,
+) -> dict[str, Any]:
+    """Run one workload against one store, call in a fresh process for peak RSS."""
+    module = importlib.import_module(f"benchmarks.{workload_name}")
+    workload: Workload = module.make(seed, scale)
+    graph = st.compile(workload.query)
+
+    with _store(store_name, graph, postgres_url) as [store, disk_bytes]:
+        for inputs in workload.setup:
+            st.iteration(store, graph, inputs)  # type: ignore[arg-type]
+
+        gc.collect()
+        latencies = list[float]()
+        for inputs in workload.ticks:
+            before = time.perf_counter()
+            st.iteration(store, graph, inputs)  # type: ignore[arg-type]
+            latencies.append(time.perf_counter() - before)
+        # Include the time to commit any writes still queued
+        before = time.perf_counter()
+        if isinstance(store, st.StoreSQL):
+            store.drain()
+        drain_secs = time.perf_counter() - before
+
+        sizes = store.sizes()
+        result = Result(
+            workload=workload_name,
+            store=store_name,
+            ticks=len(latencies),
+            rows=sum(_count_rows(inputs) for inputs in workload.ticks),
+            secs=sum(latencies) + drain_secs,
+            rows_per_sec=0.0,
+            latency_ms_p50=_percentile(latencies, 50) * 1000,
+            latency_ms_p90=_percentile(latencies, 90) * 1000,
+            latency_ms_p99=_percentile(latencies, 99) * 1000,
+            latency_ms_max=max(latencies, default=0.0) * 1000,
+            peak_rss_bytes=_peak_rss_bytes(),
+            state_rows=sum(s.rows for s in sizes.values()),
+            state_bytes=sum(s.bytes for s in sizes.values()),
+            state_index_bytes=sum(s.index_bytes for s in sizes.values()),
+            disk_bytes=disk_bytes(),
+        )
+        result.rows_per_sec = result.rows / result.secs if result.secs else 0.0
+        return asdict(result)
+
+
+@contextmanager
+def _store(
+    store_name: str, graph: st.Graph[Any, Any], postgres_url: str | None
+) -> Iterator[tuple[st.StorePython | st.StoreSQL, Callable[[], int | None]]]:
+    if store_name == "python":
+        yield st.StorePython.from_graph(graph), lambda: None
+
+    elif store_name in ("sqlite", "sqlite-write-behind"):
+        with tempfile.TemporaryDirectory() as dir, ExitStack() as stack:
+            path = pathlib.Path(dir) / "benchmark.db"
+            conn = stack.enter_context(st.connection_sqlite(path))
+            write_conn = None
+            if store_name == "sqlite-write-behind":
+                write_conn = stack.enter_context(
+                    st.connection_sqlite(path, check_same_thread=False)
+                )
+            store = st.StoreSQLite.from_graph(conn, graph, True, write_conn)
+            yield store, lambda: sum(p.stat().st_size for p in path.parent.iterdir())
+            store.close()
+
+    elif store_name in ("postgres", "postgres-write-behind"):
+        if postgres_url is None:
+            raise RuntimeError("--postgres-url is required to benchmark postgres")
+        with ExitStack() as stack:
+            conn_pg = stack.enter_context(st.connection_postgres(postgres_url))
+            write_conn_pg = None
+            if store_name == "postgres-write-behind":
+                write_conn_pg = stack.enter_context(
+                    st.connection_postgres(postgres_url)
+                )
+            _drop_tables(conn_pg, graph)
+            store_pg = st.StorePostgres.from_graph(conn_pg, graph, True, write_conn_pg)
+            try:
+                yield store_pg, lambda: sum(
+                    s.bytes + s.index_bytes for s in store_pg.sizes().values()
+                )
+                store_pg.close()
+            finally:
+                _drop_tables(conn_pg, graph)
+
+    else:
+        raise RuntimeError(f"Unknown store: {store_name}")
+
+
+def _drop_tables(conn: st.ConnPostgres, graph: st.Graph[Any, Any]) -> None:
+    with conn.transaction():
+        [(has_last_update,)] = conn.execute(
+            "SELECT to_regclass('last_update') IS NOT NULL"
+        )
+        for vertex in graph.delay_vertices:
+            conn.execute(f"DROP TABLE IF EXISTS {table_name(vertex)}")
+            if has_last_update:
+                qry = "DELETE FROM last_update WHERE table_name = %s"
+                conn.execute(qry, (table_name(vertex),))
+
+
+def _count_rows(inputs: Tick) -> int:
+    return sum(abs(count) for z in inputs for _, count in z.iter())
+
+
+def _percentile(values: list[float], n: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[n - 1]
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
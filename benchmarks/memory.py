@@ -0,0 +1,74 @@
+"""Bytes per row of meter reads held in a `ZSetPython`, with and without slots.
+
+    python -m benchmarks.memory --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any
+from uuid import UUID
+
+from tabulate import tabulate
+
+import stepping as st
+
+
+class Read(st.Data):
+    meter_id: UUID
+    timestamp: datetime
+    value: float
+
+
+class ReadSlots(st.Data, slots=True):
+    meter_id: UUID
+    timestamp: datetime
+    value: float
+
+
+def bytes_per_row(t: type[Read] | type[ReadSlots], rows: int, stored: bool) -> float:
+    """If `stored`, include the cached `.st_bytes` and `.st_identifier`."""
+    rng = random.Random(0)
+    meter_ids = [UUID(int=rng.getrandbits(128)) for _ in range(100)]
+    start = datetime(2023, 1, 1)
+    # Made before tracing starts, so shared between rows either way
+    timestamps = [start + timedelta(minutes=30 * i) for i in range(rows)]
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    z = st.ZSetPython[Any]()
+    values = [
+        t(meter_id=meter_ids[i % 100], timestamp=timestamps[i], value=rng.random())
+        for i in range(rows)
+    ]
+    if stored:
+        for value in values:
+            value.st_identifier
+    z += st.ZSetPython({value: 1 for value in values})
+    del values
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memory")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    types: list[type[Read] | type[ReadSlots]] = [Read, ReadSlots]
+    table = [
+        [t.__name__, stored, f"{bytes_per_row(t, args.rows, stored):.0f}"]
+        for t in types
+        for stored in (False, True)
+    ]
+    print(tabulate(table, ["class", "stored", "bytes_per_row"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Users have meters have reads, sum up each meter's daily usage.
+
+As per docs-md/examples/meter-reads.md.
+"""
+from __future__ import annotations
+
+import random
+from datetime import date, datetime, timedelta
+from uuid import UUID
+
+import stepping as st
+from benchmarks.harness import Tick, Workload, tick
+
+
+class User(st.Data):
+    user_id: int
+    name: str
+
+
+class Meter(st.Data):
+    meter_id: UUID
+    user_id: int
+
+
+class HalfHourlyMeterRead(st.Data):
+    meter_id: UUID
+    timestamp: datetime
+    value: float
+
+
+class UserMeter(User, Meter):
+    ...
+
+
+class UserMeterRead(User, Meter, HalfHourlyMeterRead):
+    date: date
+
+
+class DailyUsage(st.Data):
+    user_id: int
+    meter_id: UUID
+    date: date
+    value: float
+
+
+def make_user_meter(p: st.Pair[User, Meter]) -> UserMeter:
+    return UserMeter(
+        user_id=p.left.user_id,
+        name=p.left.name,
+        meter_id=p.right.meter_id,
+    )
+
+
+def with_date(p: st.Pair[UserMeter, HalfHourlyMeterRead]) -> UserMeterRead:
+    return UserMeterRead(
+        user_id=p.left.user_id,
+        name=p.left.name,
+        meter_id=p.left.meter_id,
+        timestamp=p.right.timestamp,
+        value=p.right.value,
+        date=p.right.timestamp.date(),
+    )
+
+
+def to_daily(p: st.Pair[float, tuple[int, UUID, date]]) -> DailyUsage:
+    user_id, meter_id, date = p.right
+    return DailyUsage(user_id=user_id, meter_id=meter_id, date=date, value=p.left)
+
+
+def pick_value(u: UserMeterRead) -> float:
+    return u.value
+
+
+index_daily = st.Index.pick(DailyUsage, lambda d: d.date)
+daily_cache = st.Cache[DailyUsage]()
+
+
+def query(
+    users: st.ZSet[User],
+    meters: st.ZSet[Meter],
+    reads: st.ZSet[HalfHourlyMeterRead],
+) -> st.ZSet[DailyUsage]:
+    join_meters = st.join(
+        users,
+        meters,
+        on_left=st.Index.pick(User, lambda u: u.user_id),
+        on_right=st.Index.pick(Meter, lambda m: m.user_id),
+    )
+    join_meters_flat = st.map(join_meters, f=make_user_meter)
+    join_reads = st.join(
+        join_meters_flat,
+        reads,
+        on_left=st.Index.pick(UserMeter, lambda p: p.meter_id),
+        on_right=st.Index.pick(HalfHourlyMeterRead, lambda m: m.meter_id),
+    )
+    merged = st.map(join_reads, f=with_date)
+    grouped = st.group_reduce_flatten(
+        merged,
+        by=st.Index.pick(UserMeterRead, lambda f: (f.user_id, f.meter_id, f.date)),
+        zero=float,
+        pick_value=pick_value,
+    )
+    as_daily = st.map(grouped, f=to_daily)
+    _ = daily_cache[as_daily](lambda a: st.integrate_indexed(a, indexes=(index_daily,)))
+    return as_daily
+
+
+def make(seed: int, scale: float) -> Workload:
+    rng = random.Random(seed)
+    n_users = max(1, int(100 * scale))
+    n_ticks = max(1, int(50 * scale))
+    batch_size = 20
+
+    users = [User(user_id=i, name=f"user-{i}") for i in range(n_users)]
+    meters = [
+        Meter(meter_id=UUID(int=rng.getrandbits(128), version=4), user_id=u.user_id)
+        for u in users
+    ]
+    start = datetime(2023, 1, 1)
+
+    def make_read() -> HalfHourlyMeterRead:
+        return HalfHourlyMeterRead(
+            meter_id=rng.choice(meters).meter_id,
+            timestamp=start + timedelta(minutes=30 * rng.randrange(48 * 30)),
+            value=round(rng.random() * 10, 2),
+        )
+
+    ticks = list[Tick]()
+    inserted = list[HalfHourlyMeterRead]()
+    for i in range(n_ticks):
+        reads = [make_read() for _ in range(batch_size)]
+        # Every so often, correct a previous read
+        removed = [inserted.pop(rng.randrange(len(inserted)))] if i % 5 == 4 else []
+        inserted.extend(reads)
+        ticks.append(tick(3, 2, insert=reads, remove=removed))
+
+    return Workload(
+        query=query,
+        setup=[tick(3, 0, insert=users), tick(3, 1, insert=meters)],
+        ticks=ticks,
+    )
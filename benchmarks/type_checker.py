@@ -0,0 +1,136 @@
+"""Incrementally resolve the nested attributes of classes.
+
+As per docs-md/examples/type-checker.md.
+"""
+from __future__ import annotations
+
+import random
+
+import stepping as st
+from benchmarks.harness import Tick, Workload, tick
+
+
+class Class(st.Data):
+    identifier: str  # eg: "one.A"
+    attrs: tuple[tuple[str, str], ...]
+
+
+class Attr(st.Data):
+    identifier: str  # eg: "one.A"
+    key: str  # eg: "x"
+    value: str  # eg: "int" or "one.A"
+
+
+class A(st.Data):
+    key: str
+    value: "str | tuple[A, ...]"
+
+
+class Resolved(st.Data):
+    identifier: str  # eg: "one.A"
+    attrs: tuple[A, ...]
+
+
+def to_many_attrs(c: Class) -> frozenset[Attr]:
+    return frozenset(
+        Attr(identifier=c.identifier, key=key, value=value) for key, value in c.attrs
+    )
+
+
+def to_edge(a: Attr) -> st.Pair[str, str]:
+    return st.Pair(a.identifier, a.value)
+
+
+def zset_zero() -> st.ZSetPython[Class]:
+    return st.ZSetPython[Class]()
+
+
+def pick_zset(p: st.Pair[st.Pair[str, str], Class]) -> st.ZSetPython[Class]:
+    return st.ZSetPython[Class]({p.right: 1})
+
+
+def resolve(
+    p: st.Pair[Class, st.Pair[st.ZSetPython[Class], str] | st.Empty]
+) -> Resolved:
+    from_class = p.left
+    identifier_to_attrs = {
+        to_class.identifier: to_class.attrs
+        for to_class, _ in (
+            [] if isinstance(p.right, st.Empty) else p.right.left.iter()
+        )
+    }
+
+    def f(key_values: tuple[tuple[str, str], ...]) -> tuple[A, ...]:
+        out = tuple[A, ...]()
+        for [key, value] in key_values:
+            if value in identifier_to_attrs:
+                out += (A(key=key, value=f(identifier_to_attrs[value])),)
+            else:
+                out += (A(key=key, value=value),)
+        return out
+
+    return Resolved(identifier=from_class.identifier, attrs=f(from_class.attrs))
+
+
+output_cache = st.Cache[Resolved]()
+
+
+def query(classes: st.ZSet[Class]) -> st.ZSet[Resolved]:
+    attrs = st.map_many(classes, f=to_many_attrs)
+    edges = st.map(attrs, f=to_edge)
+    all_edges = st.transitive_closure(edges)
+
+    from_to = st.join(
+        all_edges,
+        classes,
+        on_left=st.Index.pick(st.Pair[str, str], lambda p: p.right),
+        on_right=st.Index.pick(Class, lambda a: a.identifier),
+    )
+    grouped_by_from_identifier = st.group_reduce_flatten(
+        from_to,
+        by=st.Index.pick(st.Pair[st.Pair[str, str], Class], lambda p: p.left.left),
+        zero=zset_zero,
+        pick_value=pick_zset,
+    )
+    from_joined_to_relevant = st.outer_join(
+        classes,
+        grouped_by_from_identifier,
+        on_left=st.Index.pick(Class, lambda a: a.identifier),
+        on_right=st.Index.pick(st.Pair[st.ZSetPython[Class], str], lambda p: p.right),
+    )
+    resolved = st.map(from_joined_to_relevant, f=resolve)
+    _ = output_cache[resolved](lambda r: st.integrate(r))
+    return resolved
+
+
+def make(seed: int, scale: float) -> Workload:
+    rng = random.Random(seed)
+    n_ticks = max(1, int(20 * scale))
+    builtins = ["int", "str", "float", "bool"]
+
+    classes = list[Class]()
+
+    def make_class(identifier: str) -> Class:
+        # Refer to builtins and to classes defined earlier, so there are no cycles
+        choices = builtins + [c.identifier for c in classes[-10:]]
+        n_attrs = rng.randrange(1, 4)
+        attrs = tuple((f"a{k}", rng.choice(choices)) for k in range(n_attrs))
+        return Class(identifier=identifier, attrs=attrs)
+
+    ticks = list[Tick]()
+    for i in range(n_ticks):
+        if i % 5 == 4:
+            # Change a class that others may depend on
+            j = rng.randrange(len(classes))
+            old = classes[j]
+            new = Class(identifier=old.identifier, attrs=old.attrs + (("z", "int"),))
+            classes[j] = new
+            ticks.append(tick(1, 0, insert=[new], remove=[old]))
+        else:
+            added = list[Class]()
+            for k in range(3):
+                added.append(make_class(f"module{i}.C{k}"))
+                classes.append(added[-1])
+            ticks.append(tick(1, 0, insert=added))
+
+    return Workload(query=query, setup=[], ticks=ticks)
@@ -58,6 +58,32 @@ for ts, us in product(y("T", 4), y("U", 4)):
     )
 
 
+# for run_async.py
+
+
+print()
+for ts, us in product(y("T", 4), y("U", 4)):
+    print("@overload")
+    print(
+        f"async def iteration_async(store: Store, g: Graph[{a2(ts)}, {a2(us)}], inputs: {tuple_(ts)}, time: Time = Time()) -> {tuple_(us)}: ..."
+    )
+
+
+def async_callable_(ts: list[str], us: list[str]) -> str:
+    callables_str = ", ".join(
+        f"AsyncAction[{t}, tuple[{', '.join(us)}]]" for t in ts
+    )
+    return f"tuple[{callables_str}]"
+
+
+print()
+for ts, us in product(y("T", 4), y("U", 4)):
+    print("@overload")
+    print(
+        f"def actions_async(store: Store, g: Graph[{az(ts)}, {a2(us)}]) -> {async_callable_(ts, us)}: ..."
+    )
+
+
 def az2(ns: list[str]) -> str:
     return ", ".join(f"ZSet[{n}]" for n in ns)
 
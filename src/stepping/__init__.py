@@ -40,6 +40,7 @@ from stepping.operators.linear import delay as delay
 from stepping.operators.linear import delay_indexed as delay_indexed
 from stepping.operators.linear import differentiate as differentiate
 from stepping.operators.linear import filter as filter
+from stepping.operators.linear import filter_batch as filter_batch
 from stepping.operators.linear import haitch as haitch
 from stepping.operators.linear import identity_print as identity_print
 from stepping.operators.linear import integrate as integrate
@@ -48,24 +49,41 @@ from stepping.operators.linear import integrate_indexed as integrate_indexed
 from stepping.operators.linear import make_scalar as make_scalar
 from stepping.operators.linear import make_set as make_set
 from stepping.operators.linear import map as map
+from stepping.operators.linear import map_batch as map_batch
 from stepping.operators.linear import map_many as map_many
 from stepping.operators.linear import neg as neg
 from stepping.operators.transform import Cache as Cache
 from stepping.operators.transform import per_group as per_group
+from stepping.parallel import PartialCommitError as PartialCommitError
+from stepping.parallel import run_parallel as run_parallel
+from stepping.profile import collect_metrics as collect_metrics
+from stepping.profile import explain_analyze as explain_analyze
+from stepping.recording import record_inputs as record_inputs
+from stepping.recording import replay as replay
 from stepping.run import actions as actions
 from stepping.run import iteration as iteration
+from stepping.run import threaded as threaded
+from stepping.run_async import AsyncAction as AsyncAction
+from stepping.run_async import actions_async as actions_async
+from stepping.run_async import iteration_async as iteration_async
+from stepping.sharded import Sharded as Sharded
+from stepping.sharded import sharded as sharded
 from stepping.steppingpack import Data as Data
 from stepping.store import StorePostgres as StorePostgres
 from stepping.store import StorePython as StorePython
 from stepping.store import StoreSQL as StoreSQL
 from stepping.store import StoreSQLite as StoreSQLite
+from stepping.store import pp_sizes as pp_sizes
 from stepping.types import Empty as Empty
 from stepping.types import Index as Index
 from stepping.types import Pair as Pair
+from stepping.types import StateSize as StateSize
 from stepping.types import Store as Store
 from stepping.types import Time as Time
 from stepping.types import ZSet as ZSet
 from stepping.types import batched as batched
+from stepping.zset.columnar import ZSetColumnar as ZSetColumnar
+from stepping.zset.columnar import vectorisable as vectorisable
 from stepping.zset.python import ZSetPython as ZSetPython
 from stepping.zset.sql.generic import ConnPostgres as ConnPostgres
 from stepping.zset.sql.generic import ConnSQLite as ConnSQLite
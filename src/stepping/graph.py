@@ -6,10 +6,13 @@ import pathlib
 import re
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any, Callable, Generic, TypeVar, get_args
+from typing import TYPE_CHECKING, Any, Callable, Generic, TypeVar, get_args
 
 from stepping import types
 
+if TYPE_CHECKING:
+    from stepping.profile import Metrics
+
 # fmt: off
 T = TypeVar("T")
 U = TypeVar("U")
@@ -78,6 +81,8 @@ class OperatorKind(enum.Enum):
     make_set = "make_set"
     map = "map"
     map_many = "map_many"
+    map_batch = "map_batch"
+    filter_batch = "filter_batch"
     neg = "neg"
     reduce = "reduce"
     # group
@@ -252,12 +257,28 @@ def _hash(v: Vertex | OperatorKind) -> int:
     return int.from_bytes(md5.digest())
 
 
+def _heat_color(fraction: float) -> str:
+    """White for cold, through to red for hot."""
+    gb = 255 - int(255 * max(0.0, min(1.0, fraction)))
+    return f"#ff{gb:02x}{gb:02x}"
+
+
 def write_png(
     graph: Graph[Any, Any],
     path: str,
     simplify_labels: bool = True,
     level: int = 2,
+    metrics: Metrics | None = None,
+    sizes: dict[VertexUnaryDelay[Any, Any], types.StateSize] | None = None,
 ) -> None:
+    """Write the graph to a .png.
+
+    If `metrics` (from `st.collect_metrics()`) are passed, vertices are coloured
+    by time spent and edges are weighted by the number of rows flowing along them.
+    If `sizes` (from `store.sizes()`) are passed, delay vertices are labelled
+    with the size of the state they hold.
+
+    """
     dir = pathlib.Path(path).parent
     dir.mkdir(exist_ok=True, parents=True)
 
@@ -285,8 +306,19 @@ def write_png(
             "khaki",
             "plum",
         ]
+        if metrics is not None:
+            return _heat_color(secs(v) / max_secs)
         return colors[_hash(v.operator_kind) % len(colors)]
 
+    def secs(v: Vertex) -> float:
+        return metrics[v.path].secs if metrics and v.path in metrics else 0.0
+
+    def rows(v: Vertex) -> int:
+        return metrics[v.path].rows if metrics and v.path in metrics else 0
+
+    max_secs = max([secs(v) for v in graph.vertices.values()] + [1e-9])
+    max_rows = max([rows(v) for v in graph.vertices.values()] + [1])
+
     level_1s = {
         l: pydot.Cluster(
             f"subgraph1_{l}",
@@ -302,11 +334,19 @@ def write_png(
         label = str(vertex)
         if simplify_labels:
             label = vertex.operator_kind.value
+        penwidth = 1.0
+        if metrics is not None:
+            label += f"\n{secs(vertex) * 1000:.2f}ms"
+            penwidth += 5.0 * secs(vertex) / max_secs
+        if sizes is not None and isinstance(vertex, VertexUnaryDelay):
+            if vertex in sizes:
+                label += f"\n{sizes[vertex]}"
         node = pydot.Node(
             _dot_identity(vertex),
             fillcolor=to_color(vertex),
             style="filled",
             label=label,
+            penwidth=penwidth,
         )
         g.add_node(node)
         subgraph = level_1s.get(_level(vertex, level) or "")
@@ -339,11 +379,17 @@ def write_png(
     for start_p, [end_p, i] in graph.internal:
         start = graph.vertices[start_p]
         end = graph.vertices[end_p]
+        label = (f"[{i}] " if i > 0 else "") + munge_type_name(start.v)
+        penwidth = 1.0
+        if metrics is not None:
+            label += f" ({rows(start)} rows)"
+            penwidth += 5.0 * rows(start) / max_rows
         g.add_edge(
             pydot.Edge(
                 _dot_identity(start),
                 _dot_identity(end),
-                label=(f"[{i}] " if i > 0 else "") + munge_type_name(start.v),
+                label=label,
+                penwidth=penwidth,
             )
         )
 
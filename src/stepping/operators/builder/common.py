@@ -137,6 +137,15 @@ def build_target_signatures(
             value = evaluate(parent_func, {}, code)
             type_scope[name] = traverse.value_to_type(value)
 
+    # Keyword only arguments with defaults may be left out
+    parameters = inspect.signature(func).parameters
+    for name, t in signature.kwargs.items():
+        if (
+            name not in assign.kwargs
+            and parameters[name].default is not inspect.Parameter.empty
+        ):
+            type_scope[name] = t
+
     arg_types = [(name, type_scope[name]) for name, _ in signature.args]
     kwarg_types = {name: type_scope[name] for name in signature.kwargs}
 
@@ -6,12 +6,25 @@ from stepping.graph import A1, Graph, OperatorKind, Path, VertexUnary
 from stepping.operators import builder, linear
 from stepping.types import Empty, Grouped, Index, K, Pair, Signature, T, ZSet
 from stepping.zset import functions
+from stepping.zset.columnar import ZSetColumnar, factorise
 from stepping.zset.python import ZSetPython
 
 
 @builder.vertex(OperatorKind.group)
 def group(a: ZSet[T], *, by: Index[T, K]) -> Grouped[ZSet[T], K]:
     out = Grouped[ZSet[T], K]()
+    if isinstance(a, ZSetColumnar):
+        # Else rows that cancel out would still make a group
+        a = a.consolidated()
+    if isinstance(a, ZSetColumnar) and (
+        (keys := a.index_column(by)) is not None
+        or (keys := a.vectorised(by.f)) is not None
+    ):
+        uniques, inverse = factorise(keys)
+        for i, key in enumerate(uniques):
+            out.set(key, a.where(inverse == i))
+        return out
+
     for value, count in a.iter():
         key = by.f(value)
         group_value = out.get(key)
@@ -16,6 +16,7 @@ from stepping.types import (
     ZSet,
     get_annotation_zset,
 )
+from stepping.zset.columnar import ZSetColumnar
 from stepping.zset.python import ZSetPython
 
 
@@ -77,6 +78,11 @@ def _f_sum(
         counted = [pick_value(v) * count for v, count in z.iter()]
         return ZSetPython((v, count) for n in counted for v, count in n.iter())  # type: ignore
 
+    if isinstance(total, (int, float)) and isinstance(z, ZSetColumnar):
+        values = z.vectorised(pick_value)
+        if values is not None:
+            return total + (values * z.counts).sum().item()  # type: ignore
+
     for v, count in z.iter():
         total += pick_value(v) * count
     return total
@@ -102,6 +108,8 @@ def reduce_lifted(
 
 
 def _f_count(z: ZSet[Any]) -> int:
+    if isinstance(z, ZSetColumnar):
+        return int(z.counts.sum())
     total = 0
     for _, count in z.iter():
         total += count
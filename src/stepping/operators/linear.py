@@ -1,4 +1,4 @@
-from typing import Callable
+from typing import Callable, Sequence
 
 from stepping.graph import OperatorKind
 from stepping.operators import builder
@@ -94,18 +94,46 @@ def differentiate(a: TAddAndNegable) -> TAddAndNegable:
 
 
 @builder.vertex(OperatorKind.map)
-def map(a: ZSet[T], *, f: Callable[[T], V]) -> ZSet[V]:
-    return functions.map(a, f)
+def map(
+    a: ZSet[T],
+    *,
+    f: Callable[[T], V],
+    parallel: int = 0,
+    chunk_size: int = functions.CHUNK_SIZE,
+) -> ZSet[V]:
+    return functions.map(a, f, parallel, chunk_size)
 
 
 @builder.vertex(OperatorKind.map_many)
-def map_many(a: ZSet[T], *, f: Callable[[T], frozenset[V]]) -> ZSet[V]:
-    return functions.map_many(a, f)
+def map_many(
+    a: ZSet[T],
+    *,
+    f: Callable[[T], frozenset[V]],
+    parallel: int = 0,
+    chunk_size: int = functions.CHUNK_SIZE,
+) -> ZSet[V]:
+    return functions.map_many(a, f, parallel, chunk_size)
 
 
 @builder.vertex(OperatorKind.filter)
-def filter(a: ZSet[T], *, f: Callable[[T], bool]) -> ZSet[T]:
-    return functions.filter(a, f)
+def filter(
+    a: ZSet[T],
+    *,
+    f: Callable[[T], bool],
+    parallel: int = 0,
+    chunk_size: int = functions.CHUNK_SIZE,
+) -> ZSet[T]:
+    return functions.filter(a, f, parallel, chunk_size)
+
+
+@builder.vertex(OperatorKind.map_batch)
+def map_batch(a: ZSet[T], *, f: Callable[[Sequence[T]], Sequence[V]]) -> ZSet[V]:
+    return functions.map_batch(a, f)
+
+
+@builder.vertex(OperatorKind.filter_batch)
+def filter_batch(a: ZSet[T], *, f: Callable[[Sequence[T]], Sequence[bool]]) -> ZSet[T]:
+    return functions.filter_batch(a, f)
 
 
 @builder.vertex(OperatorKind.reduce)
@@ -0,0 +1,149 @@
+"""Run chunks of inputs across worker processes, coordinated by `Time.frontier`.
+
+Chunk `n` is given `Time(input_time=n, frontier=n - 1, flush_every_set=True)`,
+so each worker waits for the previous chunk to be written to a table before
+reading from it, see docs-md/getting-started/storing-state.md.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import multiprocessing
+import time as time_
+from collections import defaultdict, deque
+from contextlib import AbstractContextManager, ExitStack
+from dataclasses import dataclass
+from multiprocessing.util import Finalize
+from typing import Any, Callable, Iterable
+
+from stepping.graph import Graph
+from stepping.store import StoreSQL
+from stepping.types import Time, ZSet
+
+StoreFactory = Callable[[Graph[Any, Any]], AbstractContextManager[StoreSQL]]
+
+
+class PartialCommitError(RuntimeError):
+    """A chunk failed after some of its changes were committed, so can't be retried."""
+
+
+@dataclass(frozen=True)
+class RanParallel:
+    chunks: int
+    rows: int
+    secs: float
+    retries: int
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.secs if self.secs else 0.0
+
+
+def run_parallel(
+    query: Callable[..., Any],
+    store_factory: StoreFactory,
+    chunks: Iterable[tuple[ZSet[Any], ...]],
+    workers: int = 4,
+    start_time: int = 1,
+    retries: int = 2,
+) -> RanParallel:
+    """Call `st.iteration(...)` for each chunk of inputs across `workers` processes.
+
+    Each process compiles `query` and enters `store_factory(graph)` once. Both
+    must be importable, module level functions. `start_time` should be one more
+    than the time last written to the store's `last_update` table, this is 1 for
+    new tables.
+
+    A failed chunk is retried up to `retries` times, unless some of its changes
+    were already committed, in which case `PartialCommitError` is raised.
+    """
+    todo = enumerate(chunks, start_time)
+    retry = deque[tuple[Time, tuple[ZSet[Any], ...]]]()
+    attempts = defaultdict[int, int](int)
+    in_flight = dict[
+        concurrent.futures.Future[None], tuple[Time, tuple[ZSet[Any], ...]]
+    ]()
+    n_chunks = rows = n_retries = 0
+
+    started = time_.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(query, store_factory),
+    ) as executor:
+        # Only submit as many chunks as there are workers, so a retried chunk
+        # isn't queued behind chunks that are waiting for it
+        while True:
+            while len(in_flight) < workers:
+                if retry:
+                    time, inputs = retry.popleft()
+                elif (n_inputs := next(todo, None)) is not None:
+                    n, inputs = n_inputs
+                    time = Time(input_time=n, frontier=n - 1, flush_every_set=True)
+                else:
+                    break
+                future = executor.submit(_run_chunk, inputs, time)
+                in_flight[future] = (time, inputs)
+            if not in_flight:
+                break
+
+            done, _ = concurrent.futures.wait(
+                in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                time, inputs = in_flight.pop(future)
+                error = future.exception()
+                if error is None:
+                    n_chunks += 1
+                    rows += sum(abs(c) for z in inputs for _, c in z.iter())
+                    continue
+                attempts[time.input_time] += 1
+                if (
+                    isinstance(error, PartialCommitError)
+                    or attempts[time.input_time] > retries
+                ):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise error
+                n_retries += 1
+                retry.append((time, inputs))
+
+    return RanParallel(n_chunks, rows, time_.perf_counter() - started, n_retries)
+
+
+# Per worker process state
+
+
+@dataclass
+class _Worker:
+    graph: Graph[Any, Any]
+    store: StoreSQL
+
+
+_WORKER: _Worker | None = None
+
+
+def _init_worker(query: Callable[..., Any], store_factory: StoreFactory) -> None:
+    import stepping
+
+    global _WORKER
+    graph = stepping.compile(query)
+    stack = ExitStack()
+    store = stack.enter_context(store_factory(graph))
+    Finalize(stack, stack.close, exitpriority=10)
+    _WORKER = _Worker(graph, store)
+
+
+def _run_chunk(inputs: tuple[ZSet[Any], ...], time: Time) -> None:
+    from stepping.run import iteration
+
+    assert _WORKER is not None
+    try:
+        iteration(_WORKER.store, _WORKER.graph, inputs, time)  # type: ignore[arg-type]
+    except Exception as e:
+        _WORKER.store._conn.rollback()
+        for z in _WORKER.store._current.values():
+            if z.get_last_update_time() >= time.input_time:
+                raise PartialCommitError(
+                    f"Changes from time: {time.input_time} were partially committed"
+                ) from e
+        raise
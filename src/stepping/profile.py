@@ -1,8 +1,23 @@
+from __future__ import annotations
+
 import inspect
+import threading
 import time
 from collections import defaultdict
 from contextlib import contextmanager
-from typing import Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from stepping.graph import (
+    Graph,
+    Path,
+    Vertex,
+    VertexUnaryDelay,
+    VertexUnaryIntegrateTilZero,
+)
+from stepping.types import Grouped, StateSize
+from stepping.zset.python import ZSetPython
 
 TOTALS: dict[str, float] = defaultdict(float)
 STACKS: dict[str, int] = defaultdict(int)
@@ -39,3 +54,100 @@ def pp_stacks() -> None:
     for stack, count in sorted(STACKS.items(), key=lambda kv: STACK_TOTALS[kv[0]]):
         print(count, f"{STACK_TOTALS[stack]:.2f}s", stack)
         print()
+
+
+# Per vertex metrics, collected by `run.iteration`
+
+
+@dataclass
+class VertexMetrics:
+    calls: int = 0
+    secs: float = 0.0
+    rows: int = 0  # rows output, only counted for in-memory values
+
+
+Metrics = dict[Path, VertexMetrics]
+# A context variable, so iterations in other threads or `asyncio` tasks aren't
+# collected, the lock is for `st.threaded(...)` and `st.iteration_async(...)`
+METRICS = ContextVar[Metrics | None]("METRICS", default=None)
+_METRICS_LOCK = threading.Lock()
+
+
+@contextmanager
+def collect_metrics() -> Iterator[Metrics]:
+    """Collect per vertex timings and row counts for any iterations run within."""
+    metrics = dict[Path, VertexMetrics]()
+    token = METRICS.set(metrics)
+    try:
+        yield metrics
+    finally:
+        METRICS.reset(token)
+
+
+def count_rows(value: Any) -> int | None:
+    if isinstance(value, ZSetPython):
+        return len(value._data.d)
+    if isinstance(value, Grouped):
+        counts = [count_rows(v) for v, _ in value.iter()]
+        return sum(n for n in counts if n is not None)
+    return None
+
+
+def record(vertex: Vertex, secs: float, value: Any) -> None:
+    if (collected := METRICS.get()) is None:
+        return
+    rows = count_rows(value) or 0
+    with _METRICS_LOCK:
+        metrics = collected.setdefault(vertex.path, VertexMetrics())
+        metrics.calls += 1
+        metrics.secs += secs
+        metrics.rows += rows
+
+
+def explain_analyze(
+    graph: Graph[Any, Any],
+    metrics: Metrics,
+    sizes: dict[VertexUnaryDelay[Any, Any], StateSize] | None = None,
+) -> str:
+    """Render the graph as an indented tree, like Postgres' EXPLAIN ANALYZE.
+
+    Each vertex is printed once, later references are marked with `(see above)`.
+    If `sizes` (from `store.sizes()`) are passed, delay vertices show their state.
+
+    """
+    requires: dict[Path, list[Path]] = defaultdict(list)
+    for start_p, [end_p, _] in sorted(graph.internal, key=lambda sp: sp[1][1]):
+        requires[end_p].append(start_p)
+
+    total_secs = sum(
+        m.secs
+        for p, m in metrics.items()
+        # integrate_til_zero includes the time of all its inner vertices
+        if not isinstance(graph.vertices.get(p), VertexUnaryIntegrateTilZero)
+    )
+    lines = [f"Total: {total_secs * 1000:.3f}ms"]
+    seen = set[Path]()
+
+    def walk(p: Path, depth: int) -> None:
+        vertex = graph.vertices[p]
+        m = metrics.get(p, VertexMetrics())
+        percent = (m.secs / total_secs * 100) if total_secs else 0.0
+        line = (
+            f"{'   ' * depth}-> {vertex.operator_kind.value} [{p}]  "
+            f"(time={m.secs * 1000:.3f}ms {percent:.1f}% "
+            f"rows={m.rows} calls={m.calls})"
+        )
+        if sizes is not None and isinstance(vertex, VertexUnaryDelay):
+            if vertex in sizes:
+                line += f" (state={sizes[vertex]})"
+        if p in seen:
+            lines.append(line + " (see above)")
+            return
+        seen.add(p)
+        lines.append(line)
+        for q in requires[p]:
+            walk(q, depth + 1)
+
+    for p in graph.output + graph.run_no_output:
+        walk(p, 0)
+    return "\n".join(lines)
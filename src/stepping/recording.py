@@ -0,0 +1,180 @@
+"""Record the inputs to a graph, then replay them against any store.
+
+A recording is an append-only file of length prefixed msgpack frames. The
+first frame is a header, each following frame is one call to `st.iteration`:
+
+    [wall clock secs, input_time, frontier, flush_every_set, [ZSet bytes, ...]]
+
+Where each ZSet is dumped with `steppingpack.dump`.
+"""
+from __future__ import annotations
+
+import pathlib
+import threading
+import time as time_
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Iterator
+
+import ormsgpack
+
+from stepping import steppingpack
+from stepping.graph import Graph, VertexBinary, munge_type_name
+from stepping.types import Store, Time, ZSet, get_annotation_zset
+from stepping.zset.python import ZSetPython
+
+VERSION = 1
+_LENGTH_BYTES = 4
+
+
+@dataclass
+class Recorder:
+    graph: Graph[Any, Any]
+    file: BinaryIO
+    started: float
+    # Else frames written from concurrent iterations could interleave
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def write(self, inputs: tuple[Any, ...], time: Time) -> None:
+        dumped = [steppingpack.dump(_to_python(z)) for z in inputs]
+        with self.lock:
+            frame = [
+                time_.monotonic() - self.started,
+                time.input_time,
+                time.frontier,
+                time.flush_every_set,
+                dumped,
+            ]
+            _write_frame(self.file, frame)
+
+
+# A context variable, so iterations in other threads or `asyncio` tasks aren't
+# recorded
+RECORDER = ContextVar[Recorder | None]("RECORDER", default=None)
+
+
+@contextmanager
+def record_inputs(
+    path: str | pathlib.Path, graph: Graph[Any, Any]
+) -> Iterator[Recorder]:
+    """Append the inputs of every iteration of `graph` within to `path`."""
+    path = pathlib.Path(path)
+    is_new = not path.exists() or path.stat().st_size == 0
+    with path.open("ab") as f:
+        if is_new:
+            _write_frame(f, ["stepping", VERSION, _input_type_names(graph)])
+        recorder = Recorder(graph, f, time_.monotonic())
+        token = RECORDER.set(recorder)
+        try:
+            yield recorder
+        finally:
+            RECORDER.reset(token)
+
+
+@dataclass(frozen=True)
+class Recorded:
+    secs: float  # since the recording started
+    inputs: tuple[ZSetPython[Any], ...]
+    time: Time
+
+
+def read_recording(
+    path: str | pathlib.Path, graph: Graph[Any, Any]
+) -> Iterator[Recorded]:
+    input_types = [
+        ZSetPython[get_annotation_zset(t)]  # type: ignore[misc]
+        for t in _input_types(graph)
+    ]
+    with pathlib.Path(path).open("rb") as f:
+        frames = _read_frames(f)
+        header = next(frames, None)
+        if header is None:
+            return
+        [magic, version, names] = header
+        if magic != "stepping" or version != VERSION:
+            raise RuntimeError(f"Not a stepping recording: {path}")
+        if names != _input_type_names(graph):
+            raise RuntimeError(f"Recording has inputs: {names}, graph doesn't match")
+
+        # A recording may be appended to over multiple runs, so the clock restarts
+        offset = last = 0.0
+        for [secs, input_time, frontier, flush_every_set, dumped] in frames:
+            if secs + offset < last:
+                offset = last
+            last = secs + offset
+            inputs = tuple(steppingpack.load(t, b) for t, b in zip(input_types, dumped))
+            yield Recorded(last, inputs, Time(input_time, frontier, flush_every_set))
+
+
+@dataclass(frozen=True)
+class Replayed:
+    iterations: int
+    rows: int
+    secs: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.secs if self.secs else 0.0
+
+
+def replay(
+    path: str | pathlib.Path,
+    store: Store,
+    graph: Graph[Any, Any],
+    pace: bool = False,
+) -> Replayed:
+    """Run each recorded iteration against `store` as fast as possible.
+
+    If `pace` is True, wait between iterations to match the original timings.
+    """
+    from stepping.run import iteration
+
+    iterations = rows = 0
+    secs = 0.0
+    started = time_.monotonic()
+    for recorded in read_recording(path, graph):
+        if pace:
+            time_.sleep(max(0.0, recorded.secs - (time_.monotonic() - started)))
+        before = time_.perf_counter()
+        iteration(store, graph, recorded.inputs, recorded.time)  # type: ignore[arg-type]
+        secs += time_.perf_counter() - before
+        iterations += 1
+        rows += sum(abs(c) for z in recorded.inputs for _, c in z.iter())
+    return Replayed(iterations, rows, secs)
+
+
+def _to_python(z: ZSet[Any]) -> ZSetPython[Any]:
+    if isinstance(z, ZSetPython):
+        return z
+    return ZSetPython[Any](z.iter())
+
+
+def _input_types(graph: Graph[Any, Any]) -> list[type]:
+    out = list[type]()
+    for p, i in graph.input:
+        vertex = graph.vertices[p]
+        if i == 1:
+            assert isinstance(vertex, VertexBinary)
+            out.append(vertex.u)
+        else:
+            out.append(vertex.t)
+    return out
+
+
+def _input_type_names(graph: Graph[Any, Any]) -> list[str]:
+    return [munge_type_name(t) for t in _input_types(graph)]
+
+
+def _write_frame(f: BinaryIO, frame: list[Any]) -> None:
+    b = ormsgpack.packb(frame)
+    f.write(len(b).to_bytes(_LENGTH_BYTES) + b)
+    f.flush()
+
+
+def _read_frames(f: BinaryIO) -> Iterator[list[Any]]:
+    while length_bytes := f.read(_LENGTH_BYTES):
+        b = f.read(int.from_bytes(length_bytes))
+        if len(length_bytes) < _LENGTH_BYTES or len(b) < int.from_bytes(length_bytes):
+            return  # a partially written final frame
+        yield ormsgpack.unpackb(b)
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import concurrent.futures
+import sqlite3
+import time as time_
 from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, replace
 from typing import Any, Generic, Iterator, TypeVar, assert_never, overload
 
+from stepping import profile, recording
 from stepping.graph import (
     A1,
     A2,
@@ -20,6 +26,7 @@ from stepping.graph import (
 )
 from stepping.types import Store, Time, ZSet
 from stepping.zset.python import ZSetPython
+from stepping.zset.sql.generic import Cur, ZSetSQL
 
 T = TypeVar("T")
 U = TypeVar("U")
@@ -77,17 +84,12 @@ def iteration(
     time: Time = Time(),
 ) -> tuple[Any, ...]:
     """Calculate one interation given some new inputs."""
+    if (recorder := recording.RECORDER.get()) is not None and recorder.graph is g:
+        recorder.write(inputs, time)
+    if (executor := THREADS.get()) is not None:
+        return _iteration_threaded(store, g, inputs, time, executor)
     cache = _make_cache(g, inputs)
-
-    # sorted by i to ensure insertion order, we assume no gaps
-    requires_map: dict[Vertex, list[Vertex]] = defaultdict(list)
-    for start, [p_end, _] in zip(cache, g.input):
-        end = g.vertices[p_end]
-        requires_map[end].append(start)
-    for p_start, [p_end, _] in sorted(g.internal, key=lambda vp: vp[1][1]):
-        start = g.vertices[p_start]
-        end = g.vertices[p_end]
-        requires_map[end].append(start)
+    requires_map = _requires_map(g, cache)
 
     def f(vertex: Vertex) -> Any:
         if vertex in cache:
@@ -96,30 +98,37 @@ def iteration(
         if isinstance(vertex, VertexUnary):
             (a_vertex,) = requires_map[vertex]
             if isinstance(vertex, VertexUnaryDelay):
+                before = time_.perf_counter()
                 cache[vertex] = store.get(vertex, time)
+                secs = time_.perf_counter() - before
                 a = f(a_vertex)
+                before = time_.perf_counter()
                 store.set(vertex, a, time)
+                secs += time_.perf_counter() - before
+                profile.record(vertex, secs, a)
             if isinstance(vertex, VertexUnaryIntegrateTilZero):
                 [[first_p, _]] = vertex.graph.input
                 (a_vertex,) = requires_map[vertex.graph.vertices[first_p]]
                 a = f(a_vertex)
                 # Don't flush changes, then flush the changes for all delay vertices
                 no_flush = Time(time.input_time, time.frontier, flush_every_set=None)
+                before = time_.perf_counter()
                 cache[vertex] = _indefinite_integral(store, vertex.graph, a, no_flush)
                 if time.flush_every_set is True:
                     store.flush(vertex.graph.delay_vertices, time)
+                profile.record(vertex, time_.perf_counter() - before, cache[vertex])
             else:
                 a = f(a_vertex)
                 if vertex in cache:  # during a loop
                     return cache[vertex]
-                cache[vertex] = vertex.f(a)
+                cache[vertex] = _call(vertex, a)
         elif isinstance(vertex, VertexBinary):
             a_vertex, b_vertex = requires_map[vertex]
             a = f(a_vertex)
             b = f(b_vertex)
             if vertex in cache:  # during a loop
                 return cache[vertex]
-            cache[vertex] = vertex.f(a, b)
+            cache[vertex] = _call(vertex, a, b)
         else:
             assert_never(vertex)
 
@@ -135,6 +144,30 @@ def iteration(
     return values
 
 
+def _requires_map(
+    g: Graph[Any, Any], cache: dict[Vertex, Any]
+) -> dict[Vertex, list[Vertex]]:
+    # sorted by i to ensure insertion order, we assume no gaps
+    requires_map: dict[Vertex, list[Vertex]] = defaultdict(list)
+    for start, [p_end, _] in zip(cache, g.input):
+        end = g.vertices[p_end]
+        requires_map[end].append(start)
+    for p_start, [p_end, _] in sorted(g.internal, key=lambda vp: vp[1][1]):
+        start = g.vertices[p_start]
+        end = g.vertices[p_end]
+        requires_map[end].append(start)
+    return requires_map
+
+
+def _call(vertex: Vertex, *args: Any) -> Any:
+    if profile.METRICS.get() is None:
+        return vertex.f(*args)
+    before = time_.perf_counter()
+    value = vertex.f(*args)
+    profile.record(vertex, time_.perf_counter() - before, value)
+    return value
+
+
 def _make_cache(
     g: Graph[Any, Any],
     inputs: tuple[Any, ...],
@@ -179,6 +212,175 @@ def _indefinite_integral(
     return out
 
 
+# Threaded, where vertices whose inputs are ready are called concurrently on a
+# pool of threads. The store is only touched from the calling thread, each
+# pool thread reads `ZSetSQL`s with its own cursor on the same connection.
+
+# A context variable, so concurrent `st.iteration_async(...)` calls each keep
+# their own setting
+THREADS = ContextVar[concurrent.futures.ThreadPoolExecutor | None](
+    "THREADS", default=None
+)
+
+
+@contextmanager
+def threaded(workers: int = 4) -> Iterator[None]:
+    """Call independent vertices concurrently for any iterations run within."""
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        token = THREADS.set(executor)
+        try:
+            yield
+        finally:
+            THREADS.reset(token)
+
+
+def _iteration_threaded(
+    store: Store,
+    g: Graph[Any, Any],
+    inputs: tuple[Any, ...],
+    time: Time,
+    executor: concurrent.futures.ThreadPoolExecutor,
+) -> tuple[Any, ...]:
+    cache = _make_cache(g, inputs)
+    requires_map = _requires_map(g, cache)
+    for vertex in g.vertices.values():
+        # As in the serial version, the input is the input to the inner graph
+        if isinstance(vertex, VertexUnaryIntegrateTilZero):
+            [[first_p, _]] = vertex.graph.input
+            requires_map[vertex] = requires_map[vertex.graph.vertices[first_p]]
+
+    # Only the vertices the serial version would call
+    needed = dict[Vertex, None]()
+    stack = [g.vertices[p] for p in g.output + g.run_no_output]
+    while stack:
+        vertex = stack.pop()
+        if vertex in needed or vertex in cache:
+            continue
+        needed[vertex] = None
+        stack.extend(requires_map[vertex])
+
+    # A delay's value is read from the store up front, its input is set later
+    delay_secs = dict[Vertex, float]()
+    for vertex in needed:
+        if isinstance(vertex, VertexUnaryDelay):
+            before = time_.perf_counter()
+            cache[vertex] = store.get(vertex, time)
+            delay_secs[vertex] = time_.perf_counter() - before
+
+    waiting_on = dict[Vertex, set[Vertex]]()
+    dependents = defaultdict[Vertex, list[Vertex]](list)
+    for vertex in needed:
+        waiting_on[vertex] = {v for v in requires_map[vertex] if v not in cache}
+        for required in waiting_on[vertex]:
+            dependents[required].append(vertex)
+    ready = [v for v, w in waiting_on.items() if not w]
+    in_flight = dict[concurrent.futures.Future[tuple[Any, float]], Vertex]()
+
+    def done(vertex: Vertex, value: Any, secs: float) -> None:
+        profile.record(vertex, secs, value)
+        cache[vertex] = value
+        for dependent in dependents[vertex]:
+            waiting_on[dependent].remove(vertex)
+            if not waiting_on[dependent]:
+                ready.append(dependent)
+
+    def wait_for_in_flight() -> None:
+        concurrent.futures.wait(in_flight)
+        while in_flight:
+            future, vertex = in_flight.popitem()
+            try:
+                done(vertex, *future.result())
+            except _SameThreadOnly:
+                args = [cache[v] for v in requires_map[vertex]]
+                done(vertex, *_call_timed(vertex, *args))
+
+    try:
+        while ready or in_flight:
+            while ready:
+                vertex = ready.pop()
+                args = [cache[v] for v in requires_map[vertex]]
+                if isinstance(vertex, VertexUnaryDelay):
+                    # Flushing mid iteration changes tables other threads may read
+                    if time.flush_every_set is True:
+                        wait_for_in_flight()
+                    before = time_.perf_counter()
+                    (a,) = args
+                    store.set(vertex, a, time)
+                    secs = delay_secs[vertex] + time_.perf_counter() - before
+                    profile.record(vertex, secs, a)
+                elif isinstance(vertex, VertexUnaryIntegrateTilZero):
+                    wait_for_in_flight()
+                    no_flush = Time(
+                        time.input_time, time.frontier, flush_every_set=None
+                    )
+                    before = time_.perf_counter()
+                    (a,) = args
+                    value = _indefinite_integral(store, vertex.graph, a, no_flush)
+                    if time.flush_every_set is True:
+                        store.flush(vertex.graph.delay_vertices, time)
+                    done(vertex, value, time_.perf_counter() - before)
+                else:
+                    future = executor.submit(_call_in_thread, vertex, *args)
+                    in_flight[future] = vertex
+            if in_flight:
+                finished, _ = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    vertex = in_flight.pop(future)
+                    try:
+                        done(vertex, *future.result())
+                    except _SameThreadOnly:
+                        args = [cache[v] for v in requires_map[vertex]]
+                        done(vertex, *_call_timed(vertex, *args))
+    except BaseException:
+        concurrent.futures.wait(in_flight)
+        raise
+
+    assert not any(waiting_on.values()), "Cycle without a delay vertex"
+    values = tuple(cache[g.vertices[p]] for p in g.output)
+    store.inc(time)
+    return values
+
+
+class _SameThreadOnly(Exception):
+    """Eg. a SQLite connection opened without `check_same_thread=False`."""
+
+
+def _call_timed(vertex: Vertex, *args: Any) -> tuple[Any, float]:
+    before = time_.perf_counter()
+    value = vertex.f(*args)
+    return value, time_.perf_counter() - before
+
+
+def _call_in_thread(vertex: Vertex, *args: Any) -> tuple[Any, float]:
+    # Cursors are opened per call and closed after, by id of the original
+    # cursor, which is kept alive by `args` until then
+    cursors = dict[int, Cur]()
+    originals = dict[int, Cur]()
+
+    def for_thread(a: Any) -> Any:
+        if not isinstance(a, ZSetSQL):
+            return a
+        if id(a.cur) not in cursors:
+            try:
+                cur = a.cur.connection.cursor()
+            except sqlite3.ProgrammingError as e:
+                raise _SameThreadOnly() from e
+            cursors[id(a.cur)] = cur
+            originals[id(cur)] = a.cur
+        return a.with_cursor(cursors[id(a.cur)])
+
+    try:
+        value, secs = _call_timed(vertex, *[for_thread(a) for a in args])
+    finally:
+        for cur in cursors.values():
+            cur.close()
+    if isinstance(value, ZSetSQL) and id(value.cur) in originals:
+        value = value.with_cursor(originals[id(value.cur)])
+    return value, secs
+
+
 @dataclass
 class Action(Generic[T, V_co]):
     store: Store
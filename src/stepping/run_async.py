@@ -0,0 +1,142 @@
+"""Run iterations from asyncio code without blocking the event loop.
+
+The operators read from stores synchronously, so each iteration is run on a
+thread with `asyncio.to_thread(...)`. Iterations against the same store run one
+at a time, in the order they were awaited.
+"""
+from __future__ import annotations
+
+import asyncio
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, TypeVar, overload
+
+from stepping.graph import A1, A2, A3, A4, Graph
+from stepping.run import Action, iteration
+from stepping.types import Store, Time, ZSet
+
+T = TypeVar("T")
+V_co = TypeVar("V_co", covariant=True)
+R = TypeVar("R")
+T1 = TypeVar("T1")
+T2 = TypeVar("T2")
+T3 = TypeVar("T3")
+T4 = TypeVar("T4")
+U1 = TypeVar("U1")
+U2 = TypeVar("U2")
+U3 = TypeVar("U3")
+U4 = TypeVar("U4")
+
+# Only held onto while an iteration is waiting or running, keyed by `id(store)`
+_LOCKS: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+async def _run(store: Store, f: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+    lock = _LOCKS.get(id(store))
+    if lock is None:
+        lock = _LOCKS[id(store)] = asyncio.Lock()
+    async with lock:
+        return await asyncio.to_thread(f, *args, **kwargs)
+
+
+# generated by python scripts/type_gen.py
+# fmt: off
+@overload
+async def iteration_async(store: Store, g: Graph[A1[T1], A1[U1]], inputs: tuple[T1], time: Time = Time()) -> tuple[U1]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A1[T1], A2[U1, U2]], inputs: tuple[T1], time: Time = Time()) -> tuple[U1, U2]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A1[T1], A3[U1, U2, U3]], inputs: tuple[T1], time: Time = Time()) -> tuple[U1, U2, U3]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A1[T1], A4[U1, U2, U3, U4]], inputs: tuple[T1], time: Time = Time()) -> tuple[U1, U2, U3, U4]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A2[T1, T2], A1[U1]], inputs: tuple[T1, T2], time: Time = Time()) -> tuple[U1]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A2[T1, T2], A2[U1, U2]], inputs: tuple[T1, T2], time: Time = Time()) -> tuple[U1, U2]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A2[T1, T2], A3[U1, U2, U3]], inputs: tuple[T1, T2], time: Time = Time()) -> tuple[U1, U2, U3]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A2[T1, T2], A4[U1, U2, U3, U4]], inputs: tuple[T1, T2], time: Time = Time()) -> tuple[U1, U2, U3, U4]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A3[T1, T2, T3], A1[U1]], inputs: tuple[T1, T2, T3], time: Time = Time()) -> tuple[U1]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A3[T1, T2, T3], A2[U1, U2]], inputs: tuple[T1, T2, T3], time: Time = Time()) -> tuple[U1, U2]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A3[T1, T2, T3], A3[U1, U2, U3]], inputs: tuple[T1, T2, T3], time: Time = Time()) -> tuple[U1, U2, U3]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A3[T1, T2, T3], A4[U1, U2, U3, U4]], inputs: tuple[T1, T2, T3], time: Time = Time()) -> tuple[U1, U2, U3, U4]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A4[T1, T2, T3, T4], A1[U1]], inputs: tuple[T1, T2, T3, T4], time: Time = Time()) -> tuple[U1]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A4[T1, T2, T3, T4], A2[U1, U2]], inputs: tuple[T1, T2, T3, T4], time: Time = Time()) -> tuple[U1, U2]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A4[T1, T2, T3, T4], A3[U1, U2, U3]], inputs: tuple[T1, T2, T3, T4], time: Time = Time()) -> tuple[U1, U2, U3]: ...
+@overload
+async def iteration_async(store: Store, g: Graph[A4[T1, T2, T3, T4], A4[U1, U2, U3, U4]], inputs: tuple[T1, T2, T3, T4], time: Time = Time()) -> tuple[U1, U2, U3, U4]: ...
+# fmt: on
+async def iteration_async(
+    store: Store,
+    g: Graph[Any, Any],
+    inputs: tuple[Any, ...],
+    time: Time = Time(),
+) -> tuple[Any, ...]:
+    """Like `st.iteration(...)`, run on a thread."""
+    return await _run(store, iteration, store, g, inputs, time)
+
+
+@dataclass
+class AsyncAction(Generic[T, V_co]):
+    action: Action[T, V_co]
+
+    async def insert(self, *inputs: T, time: Time = Time()) -> V_co:
+        return await _run(self.action.store, self.action.insert, *inputs, time=time)
+
+    async def remove(self, *inputs: T, time: Time = Time()) -> V_co:
+        return await _run(self.action.store, self.action.remove, *inputs, time=time)
+
+    async def replace(self, old: T, new: T, time: Time = Time()) -> V_co:
+        return await _run(self.action.store, self.action.replace, old, new, time=time)
+
+
+# fmt: off
+@overload
+def actions_async(store: Store, g: Graph[A1[ZSet[T1]], A1[U1]]) -> tuple[AsyncAction[T1, tuple[U1]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A1[ZSet[T1]], A2[U1, U2]]) -> tuple[AsyncAction[T1, tuple[U1, U2]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A1[ZSet[T1]], A3[U1, U2, U3]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A1[ZSet[T1]], A4[U1, U2, U3, U4]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3, U4]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A2[ZSet[T1], ZSet[T2]], A1[U1]]) -> tuple[AsyncAction[T1, tuple[U1]], AsyncAction[T2, tuple[U1]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A2[ZSet[T1], ZSet[T2]], A2[U1, U2]]) -> tuple[AsyncAction[T1, tuple[U1, U2]], AsyncAction[T2, tuple[U1, U2]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A2[ZSet[T1], ZSet[T2]], A3[U1, U2, U3]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3]], AsyncAction[T2, tuple[U1, U2, U3]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A2[ZSet[T1], ZSet[T2]], A4[U1, U2, U3, U4]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3, U4]], AsyncAction[T2, tuple[U1, U2, U3, U4]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A3[ZSet[T1], ZSet[T2], ZSet[T3]], A1[U1]]) -> tuple[AsyncAction[T1, tuple[U1]], AsyncAction[T2, tuple[U1]], AsyncAction[T3, tuple[U1]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A3[ZSet[T1], ZSet[T2], ZSet[T3]], A2[U1, U2]]) -> tuple[AsyncAction[T1, tuple[U1, U2]], AsyncAction[T2, tuple[U1, U2]], AsyncAction[T3, tuple[U1, U2]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A3[ZSet[T1], ZSet[T2], ZSet[T3]], A3[U1, U2, U3]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3]], AsyncAction[T2, tuple[U1, U2, U3]], AsyncAction[T3, tuple[U1, U2, U3]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A3[ZSet[T1], ZSet[T2], ZSet[T3]], A4[U1, U2, U3, U4]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3, U4]], AsyncAction[T2, tuple[U1, U2, U3, U4]], AsyncAction[T3, tuple[U1, U2, U3, U4]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A4[ZSet[T1], ZSet[T2], ZSet[T3], ZSet[T4]], A1[U1]]) -> tuple[AsyncAction[T1, tuple[U1]], AsyncAction[T2, tuple[U1]], AsyncAction[T3, tuple[U1]], AsyncAction[T4, tuple[U1]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A4[ZSet[T1], ZSet[T2], ZSet[T3], ZSet[T4]], A2[U1, U2]]) -> tuple[AsyncAction[T1, tuple[U1, U2]], AsyncAction[T2, tuple[U1, U2]], AsyncAction[T3, tuple[U1, U2]], AsyncAction[T4, tuple[U1, U2]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A4[ZSet[T1], ZSet[T2], ZSet[T3], ZSet[T4]], A3[U1, U2, U3]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3]], AsyncAction[T2, tuple[U1, U2, U3]], AsyncAction[T3, tuple[U1, U2, U3]], AsyncAction[T4, tuple[U1, U2, U3]]]: ...
+@overload
+def actions_async(store: Store, g: Graph[A4[ZSet[T1], ZSet[T2], ZSet[T3], ZSet[T4]], A4[U1, U2, U3, U4]]) -> tuple[AsyncAction[T1, tuple[U1, U2, U3, U4]], AsyncAction[T2, tuple[U1, U2, U3, U4]], AsyncAction[T3, tuple[U1, U2, U3, U4]], AsyncAction[T4, tuple[U1, U2, U3, U4]]]: ...
+# fmt: on
+def actions_async(
+    store: Store,
+    g: Graph[Any, Any],
+) -> Any:  # tuple[AsyncAction[Any, tuple[Any, ...]], ...]:
+    fs = list[AsyncAction[Any, Any]]()
+    for i, _ in enumerate(g.input):
+        fs.append(AsyncAction(Action(store, g, i)))
+    return tuple(fs)
@@ -0,0 +1,140 @@
+"""Run one query across worker processes, with the inputs partitioned by key.
+
+Each shard is a process with its own store. Every input `ZSet` is split by
+hashing the key of an `Index` per input, so all the rows for a key always go
+to the same shard. As long as the query never combines rows with different
+keys, the output of each iteration is the sum of the output of each shard.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import hashlib
+import multiprocessing
+from contextlib import AbstractContextManager, ExitStack, contextmanager
+from dataclasses import dataclass
+from multiprocessing.util import Finalize
+from typing import Any, Callable, Iterator
+
+from stepping import steppingpack
+from stepping.graph import Graph
+from stepping.types import Index, Store, Time, ZSet
+from stepping.zset.python import ZSetPython
+
+ShardStoreFactory = Callable[[Graph[Any, Any], int], AbstractContextManager[Store]]
+
+
+def shard_of(index: Index[Any, Any], value: Any, shards: int) -> int:
+    """Stable across processes and restarts, unlike `hash(...)`."""
+    dumped = steppingpack.dump(index.f(value))
+    digest = hashlib.md5(dumped).digest()
+    return int.from_bytes(digest[:8]) % shards
+
+
+def partition(
+    z: ZSet[Any], index: Index[Any, Any], shards: int
+) -> list[ZSetPython[Any]]:
+    parts = [dict[Any, int]() for _ in range(shards)]
+    for value, count in z.iter():
+        parts[shard_of(index, value, shards)][value] = count
+    return [ZSetPython[Any](part) for part in parts]
+
+
+@dataclass
+class Sharded:
+    indexes: tuple[Index[Any, Any], ...]
+    executors: list[concurrent.futures.ProcessPoolExecutor]
+    n_outputs: int
+
+    def iteration(
+        self, inputs: tuple[ZSet[Any], ...], time: Time = Time()
+    ) -> tuple[ZSetPython[Any], ...]:
+        """Call `st.iteration(...)` on each shard with its part of `inputs`.
+
+        Shards with no changes are skipped. Shards commit independently, so if
+        one raises, the others may still have committed their changes.
+        """
+        assert len(inputs) == len(self.indexes)
+        shards = len(self.executors)
+        parts = [partition(z, ix, shards) for z, ix in zip(inputs, self.indexes)]
+
+        futures = list[concurrent.futures.Future[tuple[ZSetPython[Any], ...]]]()
+        for shard, executor in enumerate(self.executors):
+            shard_inputs = tuple(p[shard] for p in parts)
+            if all(z.empty() for z in shard_inputs):
+                continue
+            futures.append(executor.submit(_run_shard, shard_inputs, time))
+
+        outputs = [future.result() for future in futures]
+        return tuple(
+            functools.reduce(lambda a, b: a + b, (o[i] for o in outputs), ZSetPython())
+            for i in range(self.n_outputs)
+        )
+
+
+@contextmanager
+def sharded(
+    query: Callable[..., Any],
+    store_factory: ShardStoreFactory,
+    indexes: tuple[Index[Any, Any], ...],
+    shards: int = 4,
+) -> Iterator[Sharded]:
+    """Start a process per shard, each compiles `query` and enters
+    `store_factory(graph, shard)` once. Both must be importable, module level
+    functions. Each shard needs its own store, eg. a SQLite file per shard.
+
+    `indexes` has an `Index` per input of `query`, used to partition that input.
+    """
+    import stepping
+
+    graph = stepping.compile(query)
+    assert len(indexes) == len(graph.input)
+    context = multiprocessing.get_context("spawn")
+    with ExitStack() as stack:
+        executors = [
+            stack.enter_context(
+                concurrent.futures.ProcessPoolExecutor(
+                    1,
+                    mp_context=context,
+                    initializer=_init_shard,
+                    initargs=(query, store_factory, shard),
+                )
+            )
+            for shard in range(shards)
+        ]
+        yield Sharded(indexes, executors, len(graph.output))
+
+
+# Per shard process state
+
+
+@dataclass
+class _Shard:
+    graph: Graph[Any, Any]
+    store: Store
+
+
+_SHARD: _Shard | None = None
+
+
+def _init_shard(
+    query: Callable[..., Any], store_factory: ShardStoreFactory, shard: int
+) -> None:
+    import stepping
+
+    global _SHARD
+    graph = stepping.compile(query)
+    stack = ExitStack()
+    store = stack.enter_context(store_factory(graph, shard))
+    Finalize(stack, stack.close, exitpriority=10)
+    _SHARD = _Shard(graph, store)
+
+
+def _run_shard(
+    inputs: tuple[ZSetPython[Any], ...], time: Time
+) -> tuple[ZSetPython[Any], ...]:
+    from stepping.run import iteration
+
+    assert _SHARD is not None
+    outputs = iteration(_SHARD.store, _SHARD.graph, inputs, time)  # type: ignore[arg-type]
+    return tuple(ZSetPython[Any](z.iter()) for z in outputs)
@@ -7,7 +7,7 @@ from datetime import date, datetime, timezone
 from enum import Enum
 from functools import cache
 from types import NoneType, UnionType
-from typing import TYPE_CHECKING, Any, ClassVar
+from typing import TYPE_CHECKING, Any, Callable, ClassVar
 from typing import Literal as L
 from typing import (
     Protocol,
@@ -44,16 +44,18 @@ class Dumpable(Protocol):
 
 
 def dump(o: Value) -> bytes:
-    if hasattr(o, "st_bytes") and isinstance(o.st_bytes, bytes):  # type: ignore
-        return o.st_bytes  # type: ignore
+    if isinstance(o, CachedBytes):
+        return o.st_bytes
 
     dumped_python = dump_python(o)
     return ormsgpack.packb(dumped_python, option=ormsgpack.OPT_UTC_Z)
 
 
 def dump_python(o: Value) -> ValuePython:
-    if hasattr(o, "st_bytes") and isinstance(o.st_bytes, bytes):  # type: ignore
-        return ormsgpack.unpackb(o.st_bytes)  # type: ignore
+    if isinstance(o, CachedBytes):
+        # Not unpacked from any cached bytes, as that would give lists, not
+        # tuples, which can't be sorted alongside each other in frozensets
+        return o.st_python
 
     if o is None or isinstance(o, (str, int, float, bool, date, UUID, Enum)):
         return o
@@ -68,8 +70,6 @@ def dump_python(o: Value) -> ValuePython:
         return tuple(sorted(dump_python(v) for v in o))  # type: ignore[type-var]
     if hasattr(o, "st_astuple"):
         return tuple(dump_python(v) for v in o.st_astuple)
-    if isinstance(o, Data):
-        return tuple(dump_python(getattr(o, f)) for f in o.st_field_names)
     raise NotImplementedError(f"No handler for value: {o}")
 
 
@@ -82,52 +82,139 @@ def dump_indexable(o: ValueIndexable) -> ValueJSON:
 
 def make_identity(o: Value | tuple[Value, ...]) -> bytes:
     assert not isinstance(o, IDENTITYLESS)
+    if isinstance(o, CachedBytes):
+        return o.st_identifier
     if isinstance(o, (tuple, frozenset)) or hasattr(o, "st_astuple"):
         md5 = hashlib.md5()
         md5.update(dump(o))
         return md5.digest()
-    if isinstance(o, Data):
-        return o.st_identifier
     raise RuntimeError(f"Value of unknown type: {o}")
 
 
-def load(t: type[TValue], o: bytes | ValueJSON) -> TValue:
-    schema = make_schema(t)  # type: ignore[arg-type]
+def load(
+    t: type[TValue], o: bytes | ValueJSON, identity: bytes | None = None
+) -> TValue:
+    """If `t` is Data and `o` is bytes, they're reused as `.st_bytes`, as is
+    `identity` (from `make_identity(...)`) as `.st_identifier`."""
+    loader = make_loader(t)  # type: ignore[arg-type]
     if isinstance(o, bytes):
-        o = ormsgpack.unpackb(o)
-    return _load(schema, o)  # type: ignore
+        b = o
+        o = ormsgpack.unpackb(b)
+        if type(make_schema(t)) is SData:  # type: ignore[arg-type]
+            return loader(o, b, identity)  # type: ignore
+    return loader(o)  # type: ignore
+
+
+_CACHED_SLOTS = ("_st_bytes", "_st_hash", "_st_identifier", "_st_python")
+
+
+class CachedBytes:
+    """For immutable values, `.st_bytes` and `.st_identifier` are computed on
+    first use and kept, as is `.st_python` when nested in another value being
+    dumped. Anything that makes a new value from an old one must not copy them
+    across."""
+
+    # Not a literal, else mypy checks the cached values against it
+    __slots__ = tuple[str, ...]()
+    if TYPE_CHECKING:  # not in `get_type_hints(...)` of eg. `Pair`
+        _st_bytes: bytes
+        _st_identifier: bytes
+        _st_python: ValuePython
 
+    def _st_dump_python(self) -> ValuePython:
+        return tuple(dump_python(v) for v in self.st_astuple)  # type: ignore[attr-defined]
 
-def _hash_self(self: Value) -> tuple[bytes, int, bytes]:
-    st_bytes = dump(self)
-    md5 = hashlib.md5()
-    st_hash = hash(st_bytes)
-    md5.update(st_bytes)
-    st_identifier = md5.digest()
-    return st_bytes, st_hash, st_identifier
+    @property
+    def st_python(self) -> ValuePython:
+        try:
+            return self._st_python
+        except AttributeError:
+            dumped = self._st_dump_python()
+            object.__setattr__(self, "_st_python", dumped)
+            return dumped
+
+    @property
+    def st_bytes(self) -> bytes:
+        try:
+            return self._st_bytes
+        except AttributeError:
+            dumped = self._st_dump_python()
+            b = ormsgpack.packb(dumped, option=ormsgpack.OPT_UTC_Z)
+            object.__setattr__(self, "_st_bytes", b)  # may be a frozen dataclass
+            return b
+
+    @property
+    def st_identifier(self) -> bytes:
+        try:
+            return self._st_identifier
+        except AttributeError:
+            identifier = hashlib.md5(self.st_bytes).digest()
+            object.__setattr__(self, "_st_identifier", identifier)
+            return identifier
 
 
 class Meta(type):
-    def __new__(_cls, *args: Any, **kwargs: Any) -> type[Data]:
+    def __new__(_cls, *args: Any, slots: bool = False, **kwargs: Any) -> type[Data]:
         cls: type[Data] = super().__new__(_cls, *args, **kwargs)
         if cls.__module__ == "stepping.steppingpack":  # skip anything in this module
             return cls
         cls = dataclass(kw_only=True, order=True)(cls)
         cls.__hash__ = lambda self: self.st_hash  # type: ignore
         cls.st_field_names = tuple(f.name for f in fields(cls))  # type: ignore[arg-type]
+        if slots:
+            cls = _with_slots(cls)
         return cls
 
 
+def _with_slots(cls: type[Data]) -> type[Data]:
+    """As per `dataclass(slots=True)`, but with slots for the cached values too.
+
+    Slotted classes can't be combined with multiple inheritance.
+    """
+    inherited = {s for base in cls.__mro__[1:] for s in getattr(base, "__slots__", ())}
+    names = cls.st_field_names + _CACHED_SLOTS
+    d = dict(cls.__dict__)
+    for name in names + ("__dict__", "__weakref__"):
+        d.pop(name, None)  # defaults live on in __init__ and the dataclass fields
+    d["__slots__"] = tuple(name for name in names if name not in inherited)
+    return type.__new__(type(cls), cls.__name__, cls.__bases__, d)
+
+
 @dataclass_transform(kw_only_default=True)
-class Data(metaclass=Meta):
-    st_bytes: bytes = field(init=False, compare=False, repr=False)
-    st_hash: int = field(init=False, compare=False, repr=False)
-    st_identifier: bytes = field(init=False, compare=False, repr=False)
+class Data(CachedBytes, metaclass=Meta):
+    """Subclass with `class Foo(st.Data, slots=True)` for smaller instances."""
+
+    # Not a literal, else mypy checks the cached values assigned below against it
+    __slots__ = tuple[str, ...]()
     st_field_names: tuple[str, ...] = field(init=False, compare=False, repr=False)
 
     def __post_init__(self) -> None:
         make_schema(self.__class__)  # immediately make schema and cache
-        self.st_bytes, self.st_hash, self.st_identifier = _hash_self(self)
+
+    # Most instances are never stored, so this and `.st_bytes` are computed on first use
+
+    def _st_dump_python(self) -> ValuePython:
+        return tuple(dump_python(getattr(self, f)) for f in self.st_field_names)
+
+    @property
+    def st_hash(self) -> int:
+        """Consistent with `__eq__`, which compares the fields."""
+        try:
+            return self._st_hash
+        except AttributeError:
+            values = tuple(getattr(self, f) for f in self.st_field_names)
+            self._st_hash: int = hash(values)
+            return self._st_hash
+
+    def __getstate__(self) -> object:
+        """Without `._st_hash`, as `hash(...)` of eg. a str differs between
+        processes."""
+        state = super().__getstate__()
+        if isinstance(state, tuple):  # (__dict__ or None, slots) if slotted
+            d, slots = state
+            return d, {k: v for k, v in slots.items() if k != "_st_hash"}
+        assert isinstance(state, dict)
+        return {k: v for k, v in state.items() if k != "_st_hash"}
 
 
 _TYPE_MAP: dict[str, SType | None] = {}
@@ -474,6 +561,152 @@ def _load_union(schemas: tuple[SType, ...], o: ValueJSON) -> Value:
     raise RuntimeError(f"Unable to deserialize given schemas: {schemas}")
 
 
+# Loaders specialised to a schema, these do the same as `_load(schema, o)`,
+# but do the dispatching on the schema once, up front
+
+
+Loader = Callable[[ValueJSON], Value]
+_IDENTITY_ATOMS = ("str", "int", "float", "bool", "none")
+_ATOM_CONVERTERS: dict[str, Callable[[Any], Value]] = {
+    "date": date.fromisoformat,
+    "datetime": datetime.fromisoformat,
+    "uuid": UUID,
+}
+_REFERENCE_LOADERS: dict[str, Loader] = {}
+
+
+@cache
+def make_loader(t: type[Value] | None) -> Loader:
+    return _make_loader(make_schema(t))  # type: ignore[arg-type]
+
+
+def _make_loader(s: SType) -> Loader:
+    if type(s) is SAtom:
+        return lambda o: _load(s, o)
+    if type(s) is SLiteral:
+        return _make_loader(s.value)
+    if type(s) is STuple:
+        if s.many:
+            inner = _make_inner_loader(s.values[0])
+            if inner is None:
+                return tuple  # type: ignore[return-value]
+            return lambda o: tuple(inner(v) for v in o)  # type: ignore
+        loaders = [_make_loader(value) for value in s.values]
+
+        def load_tuple(o: ValueJSON) -> Value:
+            assert isinstance(o, list) and len(o) == len(loaders)
+            return tuple(f(v) for f, v in zip(loaders, o))
+
+        return load_tuple
+    if type(s) is SFrozenset:
+        inner = _make_inner_loader(s.value)
+        if inner is None:
+            return frozenset  # type: ignore[return-value]
+        return lambda o: frozenset(inner(v) for v in o)  # type: ignore
+    if type(s) is SVariadic:
+        cls = s.st_original_cls
+        value = _make_loader(s.value)
+        return lambda o: cls(value(v) for v in o)  # type: ignore
+    if type(s) is SBinary:
+        cls = s.st_original_cls
+        value_a = _make_loader(s.value_a)
+        value_b = _make_loader(s.value_b)
+        return lambda o: cls(value_a(o[0]), value_b(o[1]))  # type: ignore
+    if type(s) is SUnion:
+        if s.type == "enum":
+            return s.st_original_cls  # type: ignore[return-value]
+        options = s.options
+        return lambda o: _load_union(options, o)
+    if type(s) is SData:
+        loader = _make_data_loader(s)
+        type_name = _type_to_name(s.st_original_cls)
+        if type_name:
+            _REFERENCE_LOADERS[type_name] = loader
+        return loader
+    if type(s) is SReference:
+        reference = s.reference
+        return lambda o: _reference_loader(reference)(o)
+
+    raise NotImplementedError(f"No handler for schema: {s}")
+
+
+def _make_inner_loader(s: SType) -> Loader | None:
+    """As `_make_loader`, but None if values can be used as they are."""
+    if type(s) is SAtom and s.type in _IDENTITY_ATOMS:
+        return None
+    if type(s) is SAtom:
+        return _ATOM_CONVERTERS[s.type]
+    return _make_loader(s)
+
+
+def _make_data_loader(s: SData) -> Loader:
+    """Generates eg:
+
+        def load_Foo(o, b=None, identity=None):
+            if len(o) != 3:
+                return _load(s, o)
+            self = _new(cls)
+            self.a = o[0]
+            self.b = _loader_1(o[1])
+            self.c = o[2]
+            if b is not None:
+                self._st_bytes = b
+            if identity is not None:
+                self._st_identifier = identity
+            return self
+
+    This skips `Data.__post_init__`, unless the class overrides it.
+    """
+    cls = s.st_original_cls
+    scope: dict[str, Any] = {
+        "cls": cls,
+        "s": s,
+        "_load": _load,
+        "_new": object.__new__,
+    }
+    name = getattr(cls, "__name__", "data")
+    lines = [
+        f"def load_{name}(o, b=None, identity=None):",
+        # Shorter or longer rows, eg. from before a field was added, are left to `_load`
+        f"    if len(o) != {len(s.pairs)}:",
+        f"        return _load(s, o)",
+    ]
+    kwargs = list[str]()
+    for i, pair in enumerate(s.pairs):
+        inner = _make_inner_loader(pair.value)
+        if inner is None:
+            kwargs.append(f"o[{i}]")
+        else:
+            scope[f"_loader_{i}"] = inner
+            kwargs.append(f"_loader_{i}(o[{i}])")
+
+    if getattr(cls, "__post_init__", None) is not Data.__post_init__:
+        args = ", ".join(f"{pair.key}={v}" for pair, v in zip(s.pairs, kwargs))
+        lines.append(f"    return cls({args})")
+    else:
+        lines.append("    self = _new(cls)")
+        lines.extend(f"    self.{pair.key} = {v}" for pair, v in zip(s.pairs, kwargs))
+        lines.extend(
+            [
+                "    if b is not None:",
+                "        self._st_bytes = b",
+                "    if identity is not None:",
+                "        self._st_identifier = identity",
+                "    return self",
+            ]
+        )
+    exec("\n".join(lines), scope)
+    return scope[f"load_{name}"]  # type: ignore[no-any-return]
+
+
+def _reference_loader(reference: str) -> Loader:
+    if reference not in _REFERENCE_LOADERS:
+        s = _TYPE_MAP[reference]
+        assert isinstance(s, SData)
+        _REFERENCE_LOADERS[reference] = _make_data_loader(s)
+    return _REFERENCE_LOADERS[reference]
+
+
 # v. poor man's pydantic, but data is simple enough
 
 
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import atexit
 import hashlib
+import itertools
+import queue
+import sys
+import threading
 from collections import defaultdict
-from dataclasses import dataclass
-from typing import Any, Iterable, get_args
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field, replace
+from typing import Any, Iterable, Self, get_args
+
+from tabulate import tabulate
 
 from stepping.graph import Graph, VertexUnaryDelay
-from stepping.types import Store, Time, ZSet, is_type
+from stepping.types import StateSize, Store, Time, ZSet, is_type
 from stepping.zset.python import ZSetPython
 from stepping.zset.sql import generic, postgres, sqlite
 
@@ -45,12 +53,42 @@ class StorePython:
     def flush(self, vertices: Iterable[VertexUnaryDelay[Any, Any]], time: Time) -> None:
         raise NotImplementedError("Internally consistency not implemented")
 
+    def sizes(self, sample: int = 1000) -> dict[VertexUnaryDelay[Any, Any], StateSize]:
+        """Approximate memory held by each delay vertex.
+
+        Sizes are extrapolated from the first ``sample`` rows of each ZSet.
+        """
+        out = dict[VertexUnaryDelay[Any, Any], StateSize]()
+        for vertex, z in self._current.items():
+            assert isinstance(z, ZSetPython)
+            out[vertex] = _size_python(z, sample)
+        return out
+
 
 def _make_cursor(conn: generic.Conn) -> generic.Cur:
     cur = conn.cursor()
     return cur
 
 
+@dataclass
+class _Write:
+    value: generic.ZSetSQL[Any]
+    changes: ZSetPython[Any]  # not already queued to be written
+    # The value's peers when queued, held so their ids aren't reused
+    peers: list[generic.ZSetSQL[Any]]
+
+
+@dataclass
+class _WriteBehind:
+    conn: generic.Conn
+    queue: queue.Queue[tuple[list[_Write], Time] | None]
+    # Changes queued, but not yet committed, per table
+    pending: dict[str, list[ZSetPython[Any]]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    error: BaseException | None = None
+
+
 @dataclass
 class StoreSQL:
     _zset_cls: type[generic.ZSetSQL[Any]]
@@ -58,9 +96,14 @@ class StoreSQL:
     _changes: dict[VertexUnaryDelay[Any, Any], generic.ZSetSQL[Any]]
     _conn: generic.Conn
     _peers_by_table: dict[str, list[generic.ZSetSQL[Any]]]
+    _lock: AbstractContextManager[Any] = generic.NO_LOCK
+    _write_behind: _WriteBehind | None = None
+    # Tables that had reached the frontier at the start of this iteration
+    _reached: tuple[int, frozenset[str]] | None = None
 
     def register(self, value: generic.ZSetSQL[Any]) -> None:
-        self._peers_by_table[value.table_name].append(value)
+        with self._lock:
+            self._peers_by_table[value.table_name].append(value)
 
     # Called by subclasses
     @staticmethod
@@ -69,8 +112,15 @@ class StoreSQL:
         conn: generic.Conn,
         graph: Graph[Any, Any],
         create_tables: bool = True,
+        write_conn: generic.Conn | None = None,
+        write_queue_size: int = 2,
     ) -> StoreSQL:
         store = StoreSQL(zset_cls, {}, {}, conn, defaultdict(list))
+        if write_conn is not None:
+            store._lock = threading.RLock()
+            store._write_behind = _WriteBehind(
+                write_conn, queue.Queue(maxsize=write_queue_size)
+            )
         cur = _make_cursor(conn)
         for vertex in graph.delay_vertices:
             assert is_type(vertex.t, ZSet)
@@ -81,23 +131,48 @@ class StoreSQL:
                 table_name(vertex),
                 vertex.indexes,
                 register=store.register,
+                lock=store._lock,
             )
             if create_tables:
                 z.create_data_table()
             store._current[vertex] = z
         conn.commit()
+        if store._write_behind is not None:
+            threading.Thread(target=store._write_loop, daemon=True).start()
+            # The thread is a daemon, so would be stopped with writes still queued
+            atexit.register(store.close)
         return store
 
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
     def get(
         self, vertex: VertexUnaryDelay[Any, Any], time: Time | None
     ) -> generic.ZSetSQL[Any]:
         if vertex not in self._current:
             raise RuntimeError(f"There is nowhere to put data for key: {vertex}")
+        if self._write_behind is not None:
+            self._raise_write_error()
         value = self._current[vertex]
         if time is not None and time.frontier != -1:
-            value.wait_til_time(time.frontier)
+            if not self._has_reached_time(value, time.frontier):
+                value.wait_til_time(time.frontier)
         return value
 
+    def _has_reached_time(self, value: generic.ZSetSQL[Any], frontier: int) -> bool:
+        # Check all the tables in one query per iteration, then wait on the
+        # tables that haven't reached the frontier
+        if self._reached is None or self._reached[0] != frontier:
+            p = self._zset_cls.placeholder
+            qry = f"SELECT table_name FROM last_update WHERE t = {p}"
+            rows = self._conn.execute(qry, (frontier,))
+            reached = frozenset(name for (name,) in rows)
+            self._reached = (frontier, reached)
+        return value.table_name in self._reached[1]
+
     def set(self, vertex: VertexUnaryDelay[Any, Any], value: Any, time: Time) -> None:
         original = self._current[vertex]
 
@@ -113,11 +188,15 @@ class StoreSQL:
             self.flush([vertex], time)
 
     def inc(self, time: Time) -> None:
-        if time.flush_every_set is False:
+        if time.flush_every_set is False and self._write_behind is not None:
+            self._queue_write(time)
+        elif time.flush_every_set is False:
             self.flush(self._current, time)
         self._current |= self._changes
+        self._reached = None
 
     def flush(self, vertices: Iterable[VertexUnaryDelay[Any, Any]], time: Time) -> None:
+        self.drain()
         for vertex in vertices:
             value = self._changes[vertex]
             value.upsert()
@@ -130,6 +209,102 @@ class StoreSQL:
 
         self._conn.commit()
 
+    def sizes(self) -> dict[VertexUnaryDelay[Any, Any], StateSize]:
+        self.drain()
+        return {vertex: z.size() for vertex, z in self._current.items()}
+
+    # Write behind, where `.inc(...)` queues writes to be committed by a
+    # background thread on a separate connection. Until they're committed, the
+    # changes remain in each `ZSetSQL.changes` and are overlaid on reads.
+
+    def drain(self) -> None:
+        """Wait for all queued writes to be committed."""
+        if self._write_behind is None:
+            return
+        self._write_behind.queue.join()
+        self._raise_write_error()
+
+    def close(self) -> None:
+        """Commit any queued writes and stop the background thread, called on
+        exit if not called before."""
+        if self._write_behind is None:
+            return
+        atexit.unregister(self.close)
+        self._write_behind.queue.put(None)
+        try:
+            self.drain()
+        finally:
+            self._write_behind = None
+
+    def _raise_write_error(self) -> None:
+        assert self._write_behind is not None
+        if self._write_behind.error is not None:
+            raise RuntimeError("Error writing behind") from self._write_behind.error
+
+    def _queue_write(self, time: Time) -> None:
+        write_behind = self._write_behind
+        assert write_behind is not None
+        self._raise_write_error()
+
+        writes = list[_Write]()
+        with self._lock:
+            for value in self._changes.values():
+                pending = write_behind.pending[value.table_name]
+                changes = value.consolidate_changes()
+                for queued in pending:
+                    changes = changes + (-queued)
+                pending.append(changes)
+                peers = list(self._peers_by_table[value.table_name])
+                writes.append(_Write(value, changes, peers))
+        # End any read transaction, so we see the background thread's commits
+        self._conn.commit()
+        write_behind.queue.put((writes, time))  # blocks if the queue is full
+
+    def _write_loop(self) -> None:
+        write_behind = self._write_behind
+        assert write_behind is not None
+        cur = _make_cursor(write_behind.conn)
+        while (job := write_behind.queue.get()) is not None:
+            try:
+                if write_behind.error is None:
+                    self._write(cur, *job)
+            except BaseException as e:
+                write_behind.error = e
+                write_behind.conn.rollback()
+            finally:
+                write_behind.queue.task_done()
+        write_behind.queue.task_done()
+
+    def _write(self, cur: generic.Cur, writes: list[_Write], time: Time) -> None:
+        write_behind = self._write_behind
+        assert write_behind is not None
+        for write in writes:
+            value = replace(
+                write.value,
+                cur=cur,
+                changes=(write.changes,),
+                register=lambda _: None,
+                lock=generic.NO_LOCK,
+            )
+            value.upsert()
+            if time.input_time != -1:
+                value.set_last_update_time(time.input_time)
+
+        with self._lock:
+            write_behind.conn.commit()
+            for write in writes:
+                table_name = write.value.table_name
+                queued = write_behind.pending[table_name].pop(0)
+                assert queued is write.changes
+                # Peers from before the write was queued are no longer in use
+                old = {id(peer) for peer in write.peers} | {id(write.value)}
+                peers = self._peers_by_table[table_name]
+                self._peers_by_table[table_name] = [write.value] + [
+                    peer for peer in peers if id(peer) not in old
+                ]
+                for peer in self._peers_by_table[table_name]:
+                    peer.changes = _remove_changes(peer.changes, (write.changes,))
+
 
 class StorePostgres(StoreSQL):
     _zset_cls: type[postgres.ZSetPostgres[Any]]
@@ -139,12 +314,16 @@ class StorePostgres(StoreSQL):
         conn: generic.ConnPostgres,
         graph: Graph[Any, Any],
         create_tables: bool,
+        write_conn: generic.ConnPostgres | None = None,
+        write_queue_size: int = 2,
     ) -> StorePostgres:
         return StoreSQL._from_graph(  # type: ignore[return-value]
             postgres.ZSetPostgres,
             conn,
             graph,
             create_tables,
+            write_conn,
+            write_queue_size,
         )
 
 
@@ -156,12 +335,16 @@ class StoreSQLite(StoreSQL):
         conn: generic.ConnSQLite,
         graph: Graph[Any, Any],
         create_tables: bool,
+        write_conn: generic.ConnSQLite | None = None,
+        write_queue_size: int = 2,
     ) -> StoreSQLite:
         return StoreSQL._from_graph(  # type: ignore[return-value]
             sqlite.ZSetSQLite,
             conn,
             graph,
             create_tables,
+            write_conn,
+            write_queue_size,
         )
 
 
@@ -201,6 +384,59 @@ def _remove_changes(
     return out + tuple(-n for n in remove)
 
 
+# Rough cost of an entry in an immutables.Map node (key, value, bitmap slot)
+_MAP_ENTRY_BYTES = 3 * 8
+
+
+def _deep_sizeof(o: Any, seen: set[int]) -> int:
+    if id(o) in seen:
+        return 0
+    seen.add(id(o))
+    size = sys.getsizeof(o)
+    if isinstance(o, (str, bytes, int, float)):
+        return size
+    if isinstance(o, (tuple, list, set, frozenset)):
+        return size + sum(_deep_sizeof(n, seen) for n in o)
+    if isinstance(o, dict):
+        return size + sum(
+            _deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in o.items()
+        )
+    if hasattr(o, "__dict__"):
+        size += _deep_sizeof(vars(o), seen)
+    for name in getattr(type(o), "__slots__", ()):
+        size += _deep_sizeof(getattr(o, name, None), seen)
+    return size
+
+
+def _size_python(z: ZSetPython[Any], sample: int) -> StateSize:
+    rows = len(z._data.d)
+    if rows == 0:
+        return StateSize(0, 0, 0)
+    # Objects shared between rows (enum members, interned strings) count once
+    seen = set[int]()
+    values = [v for v, _ in itertools.islice(z._data.d.items(), sample)]
+    value_bytes = sum(_deep_sizeof(v, seen) for v in values) / len(values)
+    key_bytes = 0.0
+    for index in z.indexes:
+        keys = index.keys(values)
+        key_bytes += sum(_deep_sizeof(k, seen) for k in keys) / len(values)
+    return StateSize(
+        rows=rows,
+        bytes=int(rows * (value_bytes + _MAP_ENTRY_BYTES)),
+        index_bytes=int(rows * (key_bytes + 2 * _MAP_ENTRY_BYTES * len(z.indexes))),
+    )
+
+
+def pp_sizes(store: StorePython | StoreSQL) -> None:
+    sizes = store.sizes()
+    table = [
+        (str(vertex), size.rows, size.bytes, size.index_bytes)
+        for vertex, size in sorted(sizes.items(), key=lambda vs: -vs[1].bytes)
+    ]
+    headers = ["vertex", "rows", "bytes", "index_bytes"]
+    print(tabulate(table, headers, tablefmt="simple"))
+
+
 def pp_store(store: Store) -> None:
     assert isinstance(store, (StorePython, StoreSQL))
     for vertex, z in sorted(store._current.items(), key=lambda vz: str(vz[0])):
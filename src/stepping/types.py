@@ -4,6 +4,7 @@ from dataclasses import dataclass, field
 from datetime import date, datetime
 from functools import cache
 from itertools import islice
+from operator import attrgetter, itemgetter
 from types import NoneType
 from typing import (
     Any,
@@ -101,7 +102,7 @@ class TransformerBuilder(Protocol):
 
 
 @dataclass(frozen=True)
-class Pair(Generic[T, U]):
+class Pair(steppingpack.CachedBytes, Generic[T, U]):
     left: T
     right: U
 
@@ -145,6 +146,28 @@ class Time:
     flush_every_set: bool | None = False
 
 
+@dataclass(frozen=True)
+class StateSize:
+    rows: int
+    bytes: int  # approximate for in-memory stores
+    index_bytes: int
+
+    def __str__(self) -> str:
+        return (
+            f"{self.rows} rows, {_format_bytes(self.bytes)} "
+            f"(+{_format_bytes(self.index_bytes)} indexes)"
+        )
+
+
+def _format_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ["B", "kB", "MB", "GB"]:
+        if size < 1000:
+            break
+        size /= 1000
+    return f"{size:.1f}{unit}"
+
+
 @dataclass(frozen=True, eq=False)
 class Index(Generic[T_co, K_co]):
     names: tuple[str, ...]
@@ -153,6 +176,8 @@ class Index(Generic[T_co, K_co]):
     t: type[T_co]
     k: type[K_co]
     is_composite: bool
+    # From `Index.pick(...)`, the attribute/item path to each part of the key
+    paths: tuple[Path, ...] | None = None
 
     @classmethod
     def atom(
@@ -233,15 +258,24 @@ class Index(Generic[T_co, K_co]):
             ascending = (ascending,) * (len(get_args(k)) if is_type(k, tuple) else 1)
         assert len(ascending) == len(names)
 
+        if isinstance(proxy, tuple):
+            paths = tuple(p._path for p in proxy)
+        else:
+            paths = (proxy._path,)  # type: ignore
         return Index(
             names=names,
             ascending=ascending,
-            f=f,
+            f=make_getter(paths, isinstance(proxy, tuple)),
             t=t,
             k=k,
             is_composite=is_composite,
+            paths=paths,
         )
 
+    def keys(self: Index[T, K], values: Iterable[T]) -> list[K]:
+        """As `[.f(v) for v in values]`."""
+        return list(map(self.f, values))
+
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, Index):
             return False
@@ -345,6 +379,59 @@ def _name_type_map_from_dataclass(t: type) -> dict[str, type]:
     return name_type_map
 
 
+Path = tuple[str | int, ...]
+
+
+def make_getter(paths: tuple[Path, ...], as_tuple: bool) -> Callable[[Any], Any]:
+    """Equivalent to the function traced by `Proxy`, but built from `operator`'s
+    getters, so `lambda p: (p.left.user_id, p.right)` becomes:
+
+        attrgetter("left.user_id", "right")
+    """
+    if not as_tuple:
+        (path,) = paths
+        return _path_getter(path)
+    if len(paths) > 1 and all(path and _is_attrs(path) for path in paths):
+        return attrgetter(*(".".join(path) for path in paths))  # type: ignore
+    getters = tuple(_path_getter(path) for path in paths)
+    return lambda v: tuple(g(v) for g in getters)
+
+
+def _path_getter(path: Path) -> Callable[[Any], Any]:
+    # Consecutive attributes are combined, eg. ("a", "b", 0) -> a.b, [0]
+    getters = list[Callable[[Any], Any]]()
+    attrs = list[str]()
+    for key in path:
+        if isinstance(key, str):
+            attrs.append(key)
+            continue
+        if attrs:
+            getters.append(attrgetter(".".join(attrs)))
+            attrs = []
+        getters.append(itemgetter(key))
+    if attrs:
+        getters.append(attrgetter(".".join(attrs)))
+    if not getters:
+        return _identity
+    if len(getters) == 1:
+        return getters[0]
+
+    def get(v: Any) -> Any:
+        for g in getters:
+            v = g(v)
+        return v
+
+    return get
+
+
+def _is_attrs(path: Path) -> bool:
+    return all(isinstance(key, str) for key in path)
+
+
+def _identity(v: T) -> T:
+    return v
+
+
 @dataclass(frozen=True)
 class Proxy:
     t: type
@@ -0,0 +1,230 @@
+"""A `ZSet` stored as NumPy arrays, one per field, plus an array of counts.
+
+Some operators have a vectorised path for `ZSetColumnar`. Functions marked
+with `@vectorisable` are called once, with an object whose attributes are whole
+columns:
+
+    @vectorisable
+    def is_positive(r: Read) -> bool:
+        return r.value > 0       # called with Columns, returns an array of bools
+
+Unmarked functions are called per row as usual. Indexes from `Index.pick(...)`
+that pick a single field use that column directly.
+
+NumPy is optional, it is only imported once a `ZSetColumnar` is made.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, TypeVar
+
+from stepping import steppingpack
+from stepping.types import MATCH_ALL, Index, Indexable, K, MatchAll, T, ZSet, ZSetBodge
+from stepping.zset.python import ZSetPython
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+
+@dataclass
+class ZSetColumnar(ZSetBodge[T]):
+    t: type[T]
+    columns: dict[str, npt.NDArray[Any]]  # if `t` is not Data, one column: ""
+    counts: npt.NDArray[np.int64]
+
+    @property
+    def indexes(self) -> tuple[Index[T, Indexable], ...]:
+        return ()
+
+    @classmethod
+    def from_zset(cls, t: type[T], z: ZSet[T]) -> ZSetColumnar[T]:
+        return cls.from_iter(t, z.iter())
+
+    @classmethod
+    def from_iter(cls, t: type[T], rows: Iterable[tuple[T, int]]) -> ZSetColumnar[T]:
+        import numpy as np
+
+        names = column_names(t)
+        values = list[list[Any]]([] for _ in names)
+        counts = list[int]()
+        for value, count in rows:
+            if names == ("",):
+                values[0].append(value)
+            else:
+                for column, name in zip(values, names):
+                    column.append(getattr(value, name))
+            counts.append(count)
+        return ZSetColumnar(
+            t,
+            {name: _column(column) for name, column in zip(names, values)},
+            np.array(counts, dtype=np.int64),
+        )
+
+    def to_python(self) -> ZSetPython[T]:
+        return ZSetPython(self.iter())
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def empty(self) -> bool:
+        return len(self.consolidated()) == 0
+
+    def consolidated(self) -> ZSetColumnar[T]:
+        """Equal rows combined, and rows whose counts sum to zero dropped."""
+        import numpy as np
+
+        if not len(self):
+            return self
+        # Number each column's distinct values, then each distinct row
+        codes = [factorise(column)[1] for column in self.columns.values()]
+        _, first, inverse = np.unique(
+            np.stack(codes, axis=1), axis=0, return_index=True, return_inverse=True
+        )
+        totals = np.zeros(len(first), dtype=np.int64)
+        np.add.at(totals, inverse.reshape(-1), self.counts)
+        keep = totals != 0
+        rows = first[keep]
+        return ZSetColumnar(
+            self.t,
+            {name: column[rows] for name, column in self.columns.items()},
+            totals[keep],
+        )
+
+    def where(self, mask: npt.NDArray[np.bool_]) -> ZSetColumnar[T]:
+        return ZSetColumnar(
+            self.t,
+            {name: column[mask] for name, column in self.columns.items()},
+            self.counts[mask],
+        )
+
+    def vectorised(self, f: Callable[[T], Any]) -> npt.NDArray[Any] | None:
+        """Call `f` with whole columns, or return None if `f` isn't `@vectorisable`."""
+        import numpy as np
+
+        if not getattr(f, "st_vectorisable", False):
+            return None
+        if column_names(self.t) == ("",):
+            row: Any = self.columns[""]
+        else:
+            row = Columns(self.columns)
+        out = f(row)
+        if not isinstance(out, np.ndarray) or out.shape != self.counts.shape:
+            raise RuntimeError(
+                f"Vectorisable function: {f} should return an array, one value per row"
+            )
+        return out
+
+    def index_column(self, index: Index[T, Any]) -> npt.NDArray[Any] | None:
+        """The column picked by `index`, if it picks a single field."""
+        if index.paths is None or index.is_composite:
+            return None
+        (path,) = index.paths
+        name = ".".join(str(key) for key in path)
+        if len(path) > 1 or name not in self.columns:
+            return None
+        return self.columns[name]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ZSetColumnar):
+            other = other.to_python()
+        return bool(self.to_python() == other)
+
+    # ZSet methods
+
+    def __neg__(self) -> ZSetColumnar[T]:
+        return ZSetColumnar(self.t, self.columns, -self.counts)
+
+    def __add__(self, other: ZSet[T]) -> ZSetColumnar[T]:
+        """Rows are concatenated, `.iter()` sums the counts of equal rows."""
+        import numpy as np
+
+        if not isinstance(other, ZSetColumnar):
+            other = ZSetColumnar.from_zset(self.t, other)
+        return ZSetColumnar(
+            self.t,
+            {
+                name: np.concatenate([column, other.columns[name]])
+                for name, column in self.columns.items()
+            },
+            np.concatenate([self.counts, other.counts]),
+        )
+
+    def iter(
+        self, match: frozenset[T] | MatchAll = MATCH_ALL
+    ) -> Iterator[tuple[T, int]]:
+        totals = dict[T, int]()
+        for value, count in zip(self._values(), self.counts.tolist()):
+            totals[value] = totals.get(value, 0) + count
+        for value, count in totals.items():
+            if count != 0 and (isinstance(match, MatchAll) or value in match):
+                yield value, count
+
+    def _iter_by_index(
+        self,
+        index: Index[T, K],
+        match_keys: frozenset[K] | MatchAll = MATCH_ALL,
+    ) -> Iterator[tuple[K, T, int]]:
+        raise RuntimeError(f"ZSet does not have index: {index}")
+
+    def _values(self) -> Iterator[T]:
+        names = column_names(self.t)
+        if names == ("",):
+            yield from self.columns[""].tolist()
+            return
+        for row in zip(*(self.columns[name].tolist() for name in names)):
+            yield self.t(**dict(zip(names, row)))
+
+
+def _column(values: list[Any]) -> npt.NDArray[Any]:
+    """Numbers of one type as a numeric array, else a 1-D array of objects,
+    so eg. tuples don't become another dimension."""
+    import numpy as np
+
+    if len({type(v) for v in values}) == 1 and type(values[0]) in (int, float, bool):
+        return np.array(values)
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def factorise(column: npt.NDArray[Any]) -> tuple[list[Any], npt.NDArray[np.intp]]:
+    """The distinct values in `column`, and the position in them of each row."""
+    import numpy as np
+
+    if column.dtype != object:
+        uniques, inverse = np.unique(column, return_inverse=True)
+        return uniques.tolist(), inverse.reshape(-1)
+    # Objects may not be orderable, eg. None alongside str
+    positions = dict[Any, int]()
+    codes = [positions.setdefault(value, len(positions)) for value in column.tolist()]
+    return list(positions), np.array(codes, dtype=np.intp)
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def vectorisable(f: F) -> F:
+    """Mark `f` as safe to call with whole columns, see `ZSetColumnar.vectorised`."""
+    f.st_vectorisable = True  # type: ignore[attr-defined]
+    return f
+
+
+@dataclass(frozen=True)
+class Columns:
+    """Stands in for a row, but each attribute is a whole column."""
+
+    _columns: dict[str, npt.NDArray[Any]]
+
+    def __getattr__(self, name: str) -> npt.NDArray[Any]:
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def column_names(t: type) -> tuple[str, ...]:
+    if isinstance(t, type) and issubclass(t, steppingpack.Data):
+        return t.st_field_names
+    return ("",)
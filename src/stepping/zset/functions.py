@@ -1,25 +1,127 @@
 from __future__ import annotations
 
+import atexit
+import concurrent.futures
+import multiprocessing
 from collections import defaultdict
-from itertools import groupby
-from typing import Callable, Iterator
+from itertools import chain, groupby, repeat
+from typing import Any, Callable, Iterator, Sequence
 
 from stepping.types import MATCH_ALL, Index, Indexable, K, MatchAll, Pair, T, U, V, ZSet
+from stepping.zset.columnar import ZSetColumnar
 from stepping.zset.python import ZSetPython
 
+CHUNK_SIZE = 1000
 
-def map(z: ZSet[T], f: Callable[[T], V]) -> ZSet[V]:
+
+def map(
+    z: ZSet[T], f: Callable[[T], V], parallel: int = 0, chunk_size: int = CHUNK_SIZE
+) -> ZSet[V]:
+    if parallel:
+        return ZSetPython(_in_processes(_map_rows, f, z, parallel, chunk_size))
     return ZSetPython((f(value), count) for value, count in z.iter())
 
 
-def map_many(z: ZSet[T], f: Callable[[T], frozenset[V]]) -> ZSet[V]:
+def map_many(
+    z: ZSet[T],
+    f: Callable[[T], frozenset[V]],
+    parallel: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+) -> ZSet[V]:
+    if parallel:
+        return ZSetPython(_in_processes(_map_many_rows, f, z, parallel, chunk_size))
     return ZSetPython((v, count) for value, count in z.iter() for v in f(value))
 
 
-def filter(z: ZSet[T], f: Callable[[T], bool]) -> ZSet[T]:
+def filter(
+    z: ZSet[T], f: Callable[[T], bool], parallel: int = 0, chunk_size: int = CHUNK_SIZE
+) -> ZSet[T]:
+    if isinstance(z, ZSetColumnar) and (mask := z.vectorised(f)) is not None:
+        return z.where(mask.astype(bool))
+    if parallel:
+        return ZSetPython(_in_processes(_filter_rows, f, z, parallel, chunk_size))
     return ZSetPython((value, count) for value, count in z.iter() if f(value))
 
 
+def map_batch(z: ZSet[T], f: Callable[[Sequence[T]], Sequence[V]]) -> ZSet[V]:
+    rows = list(z.iter())
+    if not rows:
+        return ZSetPython[V]()
+    mapped = f([value for value, _ in rows])
+    _check_batch_length(f, rows, mapped)
+    return ZSetPython((v, count) for v, [_, count] in zip(mapped, rows))
+
+
+def filter_batch(z: ZSet[T], f: Callable[[Sequence[T]], Sequence[bool]]) -> ZSet[T]:
+    rows = list(z.iter())
+    if not rows:
+        return ZSetPython[T]()
+    keep = f([value for value, _ in rows])
+    _check_batch_length(f, rows, keep)
+    return ZSetPython(row for row, k in zip(rows, keep) if k)
+
+
+def _check_batch_length(
+    f: Callable[..., Any], rows: list[tuple[T, int]], out: Sequence[Any]
+) -> None:
+    if len(out) != len(rows):
+        raise RuntimeError(
+            f"{f.__name__} returned {len(out)} values, expected one per row: {len(rows)}"
+        )
+
+
+def _map_rows(f: Callable[[T], V], rows: list[tuple[T, int]]) -> list[tuple[V, int]]:
+    return [(f(value), count) for value, count in rows]
+
+
+def _map_many_rows(
+    f: Callable[[T], frozenset[V]], rows: list[tuple[T, int]]
+) -> list[tuple[V, int]]:
+    return [(v, count) for value, count in rows for v in f(value)]
+
+
+def _filter_rows(
+    f: Callable[[T], bool], rows: list[tuple[T, int]]
+) -> list[tuple[T, int]]:
+    return [(value, count) for value, count in rows if f(value)]
+
+
+# Kept between iterations, by number of processes
+_POOLS: dict[int, concurrent.futures.ProcessPoolExecutor] = {}
+
+
+@atexit.register
+def shutdown_pools() -> None:
+    """Shut down the processes kept for `parallel=` calls."""
+    while _POOLS:
+        _, pool = _POOLS.popitem()
+        pool.shutdown()
+
+
+def _in_processes(
+    f_rows: Callable[[Callable[[T], Any], list[tuple[T, int]]], list[tuple[V, int]]],
+    f: Callable[[T], Any],
+    z: ZSet[T],
+    parallel: int,
+    chunk_size: int,
+) -> Iterator[tuple[V, int]]:
+    """Call `f_rows` on chunks of rows across `parallel` processes.
+
+    If there's only one chunk, it's not worth the pickling, so call it here.
+    """
+    rows = list(z.iter())
+    if len(rows) <= chunk_size:
+        return iter(f_rows(f, rows))
+    if parallel not in _POOLS:
+        context = multiprocessing.get_context("spawn")
+        _POOLS[parallel] = concurrent.futures.ProcessPoolExecutor(
+            parallel, mp_context=context
+        )
+    chunks = [rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    mapped = _POOLS[parallel].map(f_rows, repeat(f), chunks)
+    return chain.from_iterable(mapped)
+
+
 def _first_n(rows: Iterator[tuple[T, int]], n: int) -> Iterator[tuple[T, int]]:
     total = 0
     for value, count in rows:
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass, fields
 from typing import Any, ClassVar, Iterator
 
@@ -19,12 +20,21 @@ from stepping.types import (
     ZSetBodge,
 )
 
+# Python hashes ints modulo this prime, so `hash(n) == n` for any `0 <= n < _P`
+_P = sys.hash_info.modulus
+
 
 @dataclass
-class ZSetPython(ZSetBodge[T]):
+class ZSetPython(ZSetBodge[T], steppingpack.CachedBytes):
     indexes: tuple[Index[T, Indexable], ...]
     _data: default_dict.DefaultDict[T, int]
     _data_indexes: tuple[sorted_set.SortedSet[T, Indexable], ...]  # type: ignore[type-var]
+    # sum(hash((v,)) * count) mod _P, kept up to date as values are added. The
+    # tuple mixes the bits, as for ints hash(v) == v, so {1: 2} would equal {2: 1}
+    _hash: int
+    # Counts in `_data` are multiplied by this when read, so `-z` and `z * n`
+    # don't have to copy every count
+    _scale: int
 
     def __repr__(self) -> str:
         indexes_str = (" " + repr(self.indexes)) if self.indexes else ""
@@ -58,14 +68,18 @@ class ZSetPython(ZSetBodge[T]):
         indexes: tuple[Index[T, Indexable], ...] = (),
     ) -> None:
         self._data = default_dict.DefaultDict(int)
+        self._hash = 0
+        self._scale = 1
         if data is not None:
             # Warning: data from __init__ is not indexed
             # Not sure if this is too confusing.
             if isinstance(data, dict):
                 self._data = self._data.update(data)
+                self._hash = sum(hash((v,)) * count for v, count in data.items()) % _P
             else:
                 for v, count in data:
                     self._data = self._data.set(v, self._data[v] + count)
+                    self._hash = (self._hash + hash((v,)) * count) % _P
         self.indexes = indexes
         # This ignore is kinda OK - if we've manage to define the index, it should be Serializable
         self._data_indexes = tuple(sorted_set.SortedSet(i) for i in indexes)  # type: ignore[type-var]
@@ -73,6 +87,10 @@ class ZSetPython(ZSetBodge[T]):
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, ZSetPython):
             return False
+        if self._hash != other._hash:
+            return False
+        if self._scale != other._scale:
+            return dict(self.iter()) == dict(other.iter())
         return self._data == other._data
 
     def copy(self) -> ZSetPython[T]:
@@ -80,10 +98,12 @@ class ZSetPython(ZSetBodge[T]):
         out.indexes = self.indexes
         out._data = self._data
         out._data_indexes = self._data_indexes
+        out._hash = self._hash
+        out._scale = self._scale
         return out
 
     def get_count(self, v: T) -> int:
-        return self._data.get(v, 0)
+        return self._data.get(v, 0) * self._scale
 
     def empty(self) -> bool:
         return not bool(self._data)
@@ -92,11 +112,19 @@ class ZSetPython(ZSetBodge[T]):
         if other == 0:
             return ZSetPython[T]()
         out = self.copy()
-        out._data = out._data.update({k: v * other for k, v in self.iter()})
+        out._hash = self._hash * other % _P
+        out._scale = self._scale * other
         return out
 
     def __hash__(self) -> int:
-        return hash((tuple(self.iter())))
+        """Independent of order, so doesn't need to iterate over the values."""
+        return self._hash
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        # `hash(...)` of eg. a str differs between processes, so recompute it
+        self.__dict__.update(state)
+        h = sum(hash((v,)) * count for v, count in self._data.items())
+        self._hash = h * self._scale % _P
 
     # steppingpack helpers
 
@@ -114,7 +142,8 @@ class ZSetPython(ZSetBodge[T]):
 
     def __neg__(self) -> ZSetPython[T]:
         out = self.copy()
-        out._data = out._data.update({k: -v for k, v in self.iter()})
+        out._hash = -self._hash % _P
+        out._scale = -self._scale
         return out
 
     def __add__(self, other: ZSet[T]) -> ZSetPython[T]:
@@ -127,13 +156,14 @@ class ZSetPython(ZSetBodge[T]):
     def iter(
         self, match: frozenset[T] | MatchAll = MATCH_ALL
     ) -> Iterator[tuple[T, int]]:
+        scale = self._scale
         if isinstance(match, MatchAll):
             for v, count in self._data.items():
-                yield v, count
+                yield v, count * scale
         else:
             for m in match:
                 if m in self._data:
-                    yield m, self._data[m]
+                    yield m, self._data[m] * scale
 
     def _iter_by_index(
         self,
@@ -153,10 +183,18 @@ class ZSetPython(ZSetBodge[T]):
 
 def _add(a: ZSetPython[T], b: ZSet[T], neg: bool = False) -> ZSetPython[T]:
     out = a.copy()
+    # As scale * scale == 1, adding count * scale to the stored counts keeps
+    # the scale, for other scales, apply it to the stored counts first
+    if out._scale not in (1, -1):
+        out._data = out._data.update(dict(a.iter()))
+        out._scale = 1
 
+    h = out._hash
     for v, count in b.iter():
         if neg:
             count = -count
+        h += hash((v,)) * count
+        count *= out._scale
         if v in out._data:
             new_count = out._data[v] + count
             if new_count == 0:
@@ -169,4 +207,5 @@ def _add(a: ZSetPython[T], b: ZSet[T], neg: bool = False) -> ZSetPython[T]:
             out._data = out._data.set(v, count)
             out._data_indexes = tuple(d.add(v) for d in out._data_indexes)
 
+    out._hash = h % _P
     return out
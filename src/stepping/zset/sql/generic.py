@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import functools
 import sqlite3
 import time
 from collections import defaultdict
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import dataclass, field, replace
+from datetime import date, datetime
+from enum import Enum
 from functools import cache
-from typing import Any, Callable, Iterator, Self, get_args
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, ClassVar, Iterator, Self, Sequence, get_args
+from uuid import UUID
 
 import psycopg
 
@@ -17,6 +23,8 @@ from stepping.types import (
     IndexableAtom,
     K,
     MatchAll,
+    StateSize,
+    T,
     Time,
     TSerializable,
     ZSet,
@@ -37,6 +45,10 @@ MAX_SLEEP_SECS = 5.0
 # 1.3 means this grows exponentially, but fairly slowly
 SLEEP_SECS: list[float] = [0.00001 * 1.3**n for n in range(100)]
 SLEEP_SECS = [sleep_secs for sleep_secs in SLEEP_SECS if sleep_secs <= MAX_SLEEP_SECS]
+MAX_WAIT_SECS = sum(SLEEP_SECS)
+
+# Used when there is no background thread writing to the tables
+NO_LOCK: AbstractContextManager[Any] = nullcontext()
 
 
 @dataclass(eq=False)
@@ -48,6 +60,10 @@ class ZSetSQL(ZSetBodge[TSerializable]):
     changes: tuple[ZSetPython[TSerializable], ...] = ()
     is_negative: bool = False
     register: Callable[[Self], None] = lambda _: None
+    # Held while reading `changes` alongside the table, see `StoreSQL` write behind
+    lock: AbstractContextManager[Any] = NO_LOCK
+    # Bound parameters, rather than literals, so the same statements are reused
+    placeholder: ClassVar[str] = "?"
 
     def __post_init__(self) -> None:
         self.register(self)
@@ -63,38 +79,55 @@ class ZSetSQL(ZSetBodge[TSerializable]):
         return self.t in steppingpack.IDENTITYLESS
 
     def consolidate_changes(self) -> ZSetPython[TSerializable]:
-        if not self.changes:
-            return ZSetPython[TSerializable]()
-        changes, *rest = self.changes
-        for other in rest:
-            changes += other
-        self.changes = (changes,)
-        return changes
+        with self.lock:
+            if not self.changes:
+                return ZSetPython[TSerializable]()
+            changes, *rest = self.changes
+            for other in rest:
+                changes += other
+            self.changes = (changes,)
+            return changes
+
+    def with_cursor(self, cur: Cur) -> Self:
+        with self.lock:
+            return replace(self, cur=cur)
 
     def wait_til_time(self, frontier: int) -> None:
-        qry = f"SELECT t = {frontier} FROM last_update WHERE table_name = '{self.table_name}'"
         for sleep_secs in SLEEP_SECS:
-            [(reached_time,)] = self.cur.execute(qry)
-            if reached_time:
+            if self.has_reached_time(frontier):
                 return
             time.sleep(sleep_secs)
         else:
             raise RuntimeError(f"No changes committed from frontier: {frontier}")
 
+    def has_reached_time(self, frontier: int) -> bool:
+        p = self.placeholder
+        qry = f"SELECT t = {p} FROM last_update WHERE table_name = {p}"
+        [(reached_time,)] = self.cur.execute(qry, (frontier, self.table_name))
+        return bool(reached_time)
+
+    def get_last_update_time(self) -> int:
+        qry = f"SELECT t FROM last_update WHERE table_name = {self.placeholder}"
+        [(t,)] = self.cur.execute(qry, (self.table_name,))
+        return int(t)
+
     def set_last_update_time(self, t: int) -> None:
-        qry = f"UPDATE last_update SET t = {t} WHERE table_name = '{self.table_name}'"
-        self.cur.execute(qry)
+        p = self.placeholder
+        qry = f"UPDATE last_update SET t = {p} WHERE table_name = {p}"
+        self.cur.execute(qry, (t, self.table_name))
 
     # ZSet methods
 
     def __neg__(self) -> Self:
-        return replace(self, is_negative=not self.is_negative)
+        with self.lock:
+            return replace(self, is_negative=not self.is_negative)
 
     def __add__(self, other: ZSet[TSerializable]) -> Self:
         other_python = ZSetPython[TSerializable]() + other
         other_python = (-other_python) if self.is_negative else other_python
-        changes = self.changes + (other_python,)
-        return replace(self, changes=changes)
+        with self.lock:
+            changes = self.changes + (other_python,)
+            return replace(self, changes=changes)
 
     def iter(
         self, match: frozenset[TSerializable] | MatchAll = MATCH_ALL
@@ -104,9 +137,11 @@ class ZSetSQL(ZSetBodge[TSerializable]):
 
         neg = -1 if self.is_negative else 1
 
-        changes = self.consolidate_changes()
+        with self.lock:
+            changes = self.consolidate_changes()
+            rows = self._snapshot(self.get_all(match))
         seen_from_changes = set[tuple[TSerializable, int]]()
-        for v, count in self.get_all(match):
+        for v, count in rows:
             change_count = changes.get_count(v)
             if change_count != 0:
                 seen_from_changes.add((v, change_count))
@@ -130,12 +165,19 @@ class ZSetSQL(ZSetBodge[TSerializable]):
             return iter([])
 
         neg = -1 if self.is_negative else 1
-        rows = self.get_by_key(index, match_keys)
-
-        changes = self.consolidate_changes()
-        for key, value, count in interleave_changes(rows, changes, index):
+        with self.lock:
+            changes = self.consolidate_changes()
+            rows = self._snapshot(self.get_by_key(index, match_keys))
+        for key, value, count in interleave_changes(rows, changes, index, match_keys):
             yield (key, value, count * neg)
 
+    def _snapshot(self, rows: Iterator[T]) -> Iterator[T]:
+        # If another thread may commit to the table, read the rows while holding
+        # the lock, so they're consistent with `changes`
+        if self.lock is NO_LOCK:
+            return rows
+        return iter(list(rows))
+
     # Subclass methods
 
     def create_data_table(self) -> None:
@@ -154,6 +196,9 @@ class ZSetSQL(ZSetBodge[TSerializable]):
     ) -> Iterator[tuple[TSerializable, int]]:
         raise NotImplementedError("ZSetSQL must be subclassed")
 
+    def size(self) -> StateSize:
+        raise NotImplementedError("ZSetSQL must be subclassed")
+
 
 @dataclass
 class IndexInfo:
@@ -203,9 +248,12 @@ def interleave_changes(
     a_iterator: Iterator[tuple[K, TSerializable, int]],
     changes: ZSetPython[TSerializable],
     index: Index[TSerializable, K],
+    match_keys: frozenset[K] | MatchAll = MATCH_ALL,
 ) -> Iterator[tuple[K, TSerializable, int]]:
     # TODO: just add `indexes=` to `changes` and use the sorted rows from that
     b_rows = [(index.f(v), v, c) for v, c in changes.iter()]
+    if not isinstance(match_keys, MatchAll):
+        b_rows = [(k, v, c) for k, v, c in b_rows if k in match_keys]
     b_counts: dict[K, dict[TSerializable, int]] = defaultdict(dict)
     for k, v, c in b_rows:
         b_counts[k][v] = c
@@ -235,7 +283,101 @@ def interleave_changes(
 def dump_key(
     index: Index[Any, Any], key: Indexable
 ) -> tuple[steppingpack.ValueJSON, ...]:
-    if index.is_composite:
-        return tuple(steppingpack.dump_indexable(k) for k in key)  # type: ignore
-    else:
-        return (steppingpack.dump_indexable(key),)
+    return key_codec(index).dump(key)
+
+
+@dataclass(frozen=True)
+class KeyCodec:
+    """Converts keys to and from the values of an index's columns, as
+    `steppingpack.dump_indexable(...)` and `steppingpack.load(...)` would."""
+
+    dump: Callable[[Any], tuple[steppingpack.ValueJSON, ...]]
+    # Called with a row starting with the index's columns
+    load: Callable[[Sequence[Any]], Any]
+
+
+@cache
+def key_codec(index: Index[Any, Any]) -> KeyCodec:
+    ks: tuple[Any, ...] = get_args(index.k) if index.is_composite else (index.k,)
+    dumpers = tuple(_key_dumper(k) for k in ks)
+    loaders = tuple(_key_loader(k) for k in ks)
+    if not index.is_composite:
+        return KeyCodec(_dump_atom(dumpers[0]), _load_atom(loaders[0]))
+    return KeyCodec(_dump_composite(dumpers), _load_composite(loaders))
+
+
+Dumper = Callable[[Any], steppingpack.ValueJSON]
+Loader = Callable[[Any], Any]
+
+
+def _dump_atom(dumper: Dumper | None) -> Callable[[Any], tuple[Any, ...]]:
+    if dumper is None:
+        return lambda key: (key,)
+    dump: Dumper = dumper
+    return lambda key: (dump(key),)
+
+
+def _load_atom(loader: Loader | None) -> Callable[[Sequence[Any]], Any]:
+    if loader is None:
+        return itemgetter(0)
+    load: Loader = loader
+    return lambda row: load(row[0])
+
+
+def _dump_composite(
+    dumpers: tuple[Dumper | None, ...]
+) -> Callable[[Any], tuple[Any, ...]]:
+    if all(dumper is None for dumper in dumpers):
+        return tuple
+    _dumpers = tuple(dumper or _identity for dumper in dumpers)
+    return lambda key: tuple(d(k) for d, k in zip(_dumpers, key))
+
+
+def _load_composite(
+    loaders: tuple[Loader | None, ...]
+) -> Callable[[Sequence[Any]], Any]:
+    if all(loader is None for loader in loaders):
+        n = len(loaders)
+        return lambda row: tuple(row[:n])
+    _loaders = tuple(loader or _identity for loader in loaders)
+    return lambda row: tuple(l(v) for l, v in zip(_loaders, row))
+
+
+def _key_dumper(k: Any) -> Dumper | None:
+    """None if keys of type `k` can be used as they are."""
+    if k in (str, int, float, bool):
+        return None
+    if k is UUID:
+        return str
+    if k is date:
+        return date.isoformat
+    if k is datetime:
+        return _dump_datetime
+    if isinstance(k, type) and issubclass(k, Enum):
+        return attrgetter("value")
+    return steppingpack.dump_indexable
+
+
+def _key_loader(k: Any) -> Loader | None:
+    """None if column values can be used as they are, as with `steppingpack.load`."""
+    if k in (str, int, float, bool):
+        return None
+    if k is UUID:
+        return UUID
+    if k is date:
+        return date.fromisoformat
+    if k is datetime:
+        return datetime.fromisoformat
+    return functools.partial(steppingpack.load, k)
+
+
+def _dump_datetime(d: datetime) -> steppingpack.ValueJSON:
+    offset = d.utcoffset()
+    # Unlike msgpack, `.isoformat()` includes offsets' seconds
+    if offset is not None and offset.seconds % 60:
+        return steppingpack.dump_indexable(d)
+    return d.isoformat()
+
+
+def _identity(v: T) -> T:
+    return v
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import json
+import time
 from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Iterator
+from functools import cache
+from typing import Any, ClassVar, Iterator
 
+import psycopg
+from psycopg.conninfo import make_conninfo
 from psycopg_pool import ConnectionPool
 
 from stepping import steppingpack
@@ -14,6 +18,7 @@ from stepping.types import (
     Indexable,
     K,
     MatchAll,
+    StateSize,
     TSerializable,
     ZSet,
     batched,
@@ -22,6 +27,10 @@ from stepping.zset.sql import generic
 
 _pool: ConnectionPool | None = None
 MAKE_TEST_ASSERTIONS = False
+LAST_UPDATE_CHANNEL = "stepping_last_update"
+MAX_ANY_PARAMS = 10_000  # values per `= ANY(...)` array when matching many
+# Each table prepares around 5 distinct statements
+PREPARED_MAX = 1000
 TYPE_MAP = generic.TypeDBTypeMap(
     default="TEXT",
     map=(
@@ -35,6 +44,7 @@ TYPE_MAP = generic.TypeDBTypeMap(
 @dataclass(eq=False)
 class ZSetPostgres(generic.ZSetSQL[TSerializable]):
     cur: generic.CurPostgres
+    placeholder: ClassVar[str] = "%s"
 
     def create_data_table(self) -> None:
         return _create_data_table(self)
@@ -52,16 +62,33 @@ class ZSetPostgres(generic.ZSetSQL[TSerializable]):
     ) -> Iterator[tuple[TSerializable, int]]:
         return _get_all(self, match)
 
+    def size(self) -> StateSize:
+        return _size(self)
+
+    def wait_til_time(self, frontier: int) -> None:
+        return _wait_til_time(self, frontier)
+
+    def set_last_update_time(self, t: int) -> None:
+        super().set_last_update_time(t)
+        # Sent to listeners when the transaction commits
+        qry = "SELECT pg_notify(%s, %s)"
+        self.cur.execute(qry, (LAST_UPDATE_CHANNEL, f"{self.table_name}:{t}"))
+
 
 @contextmanager
 def connection(db_url: str) -> Iterator[generic.ConnPostgres]:
     global _pool
     if _pool is None:
-        _pool = ConnectionPool(db_url)
+        _pool = ConnectionPool(db_url, configure=_configure)
     with _pool.connection() as conn:
         yield conn
 
 
+def _configure(conn: generic.ConnPostgres) -> None:
+    # psycopg keeps 100 prepared statements per connection by default
+    conn.prepared_max = PREPARED_MAX
+
+
 def explain(cur: generic.CurPostgres, qry: str, params: tuple[Any, ...] = ()) -> str:
     return "\n".join([row[0] for row in cur.execute("EXPLAIN " + qry, params)])
 
@@ -73,6 +100,28 @@ def force_index_usage(cur: generic.CurPostgres) -> Iterator[None]:
     cur.execute("SET enable_seqscan=on")
 
 
+def _wait_til_time(z_sql: ZSetPostgres[Any], frontier: int) -> None:
+    if z_sql.has_reached_time(frontier):
+        return
+
+    # LISTEN on a connection of its own, as notifications are only delivered
+    # outside of a transaction, and committing the caller's connection would
+    # commit whatever else they have open
+    info = z_sql.cur.connection.info
+    conninfo = make_conninfo(info.dsn, password=info.password)
+    with psycopg.Connection.connect(conninfo, autocommit=True) as listener:
+        listener.execute(f"LISTEN {LAST_UPDATE_CHANNEL}")
+        payload = f"{z_sql.table_name}:{frontier}"
+        deadline = time.monotonic() + generic.MAX_WAIT_SECS
+        while not z_sql.has_reached_time(frontier):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"No changes committed from frontier: {frontier}")
+            for notify in listener.notifies(timeout=remaining):
+                if notify.payload == payload:
+                    break
+
+
 def _create_data_table(z_sql: ZSetPostgres[Any]) -> None:
     table_name = z_sql.table_name
     # Do outside of a TRANSACTION
@@ -124,45 +173,58 @@ def _upsert(z_sql: ZSetPostgres[TSerializable], z: ZSet[TSerializable]) -> None:
     if not values:
         return
 
-    qs = ", ".join("%s" for _ in range(len(values[0])))
+    insert_qry, delete_qry = _qry_upsert(table_name, len(values[0]))
     for vs in batched(values, n=1000):
-        qry = f"""
-            INSERT INTO {table_name} VALUES ({qs})
-            ON CONFLICT (identity)
-            DO UPDATE SET
-                c = {table_name}.c + EXCLUDED.c
-        """
-        z_sql.cur.executemany(qry, vs)
-
-        qry = f"""
-            DELETE FROM {table_name}
-            WHERE identity IN (%s)
-            AND c = 0
-        """
+        z_sql.cur.executemany(insert_qry, vs)
         with force_index_usage(z_sql.cur):
-            z_sql.cur.executemany(qry, [(v[0],) for v in vs])
+            z_sql.cur.executemany(delete_qry, [(v[0],) for v in vs])
+
+
+@cache
+def _qry_upsert(table_name: str, n_columns: int) -> tuple[str, str]:
+    qs = ", ".join("%s" for _ in range(n_columns))
+    insert_qry = f"""
+        INSERT INTO {table_name} VALUES ({qs})
+        ON CONFLICT (identity)
+        DO UPDATE SET
+            c = {table_name}.c + EXCLUDED.c
+    """
+    delete_qry = f"""
+        DELETE FROM {table_name}
+        WHERE identity IN (%s)
+        AND c = 0
+    """
+    return insert_qry, delete_qry
 
 
 def _get_all(
     z_sql: ZSetPostgres[TSerializable],
     match: frozenset[TSerializable] | MatchAll = MATCH_ALL,
 ) -> Iterator[tuple[TSerializable, int]]:
-    table_name = z_sql.table_name
-    data_column = "identity" if z_sql.identity_is_data else "data"
-
     if not isinstance(match, MatchAll):
         if z_sql.identity_is_data:
-            hex_strings = (r"\x" + steppingpack.dump(m).hex() for m in match)
+            identities = [steppingpack.dump(m) for m in match]
         else:
-            hex_strings = (r"\x" + steppingpack.make_identity(m).hex() for m in match)
-        identity_literals = ", ".join(f"'{h}'::bytea" for h in hex_strings)
-        qry = f"SELECT {data_column}, c FROM {table_name} WHERE identity IN ({identity_literals})"
-        for data, c in z_sql.cur.execute(qry):
-            yield steppingpack.load(z_sql.t, data), c
+            identities = [steppingpack.make_identity(m) for m in match]
+        # The array is one parameter, so the query is the same for every chunk
+        qry = _qry_get_all(z_sql.table_name, z_sql.identity_is_data, True)
+        for chunk in batched(identities, n=MAX_ANY_PARAMS):
+            for data, c, identity in z_sql.cur.execute(qry, (chunk,), prepare=True):
+                yield steppingpack.load(z_sql.t, data, identity), c
     else:
-        qry = f"SELECT {data_column}, c FROM {table_name}"
-        for data, c in z_sql.cur.execute(qry):
-            yield steppingpack.load(z_sql.t, data), c
+        qry = _qry_get_all(z_sql.table_name, z_sql.identity_is_data, False)
+        for data, c, identity in z_sql.cur.execute(qry, prepare=True):
+            yield steppingpack.load(z_sql.t, data, identity), c
+
+
+@cache
+def _qry_get_all(table_name: str, identity_is_data: bool, match: bool) -> str:
+    data_column = "identity" if identity_is_data else "data"
+    identity_column = "NULL" if identity_is_data else "identity"
+    qry = f"SELECT {data_column}, c, {identity_column} FROM {table_name}"
+    if match:
+        qry += " WHERE identity = ANY(%s)"
+    return qry
 
 
 def _get_by_key(
@@ -170,45 +232,53 @@ def _get_by_key(
     index: Index[TSerializable, K],
     match_keys: frozenset[K] | MatchAll,
 ) -> Iterator[tuple[K, TSerializable, int]]:
-    table_name = z_sql.table_name
+    params: tuple[str, ...] = ()
+    if not isinstance(match_keys, MatchAll):
+        join_on = [list(generic.dump_key(index, key)) for key in match_keys]
+        params = (json.dumps(join_on),)
+    qry = _qry_get_by_key(
+        z_sql.table_name,
+        z_sql.identity_is_data,
+        index,
+        not isinstance(match_keys, MatchAll),
+    )
+
+    with force_index_usage(z_sql.cur):
+        if MAKE_TEST_ASSERTIONS:
+            assert "Index Scan" in explain(z_sql.cur, qry, params)
+
+        load_key = generic.key_codec(index).load
+        for row in z_sql.cur.execute(qry, params, prepare=True):
+            data, count, identity = row[-3:]
+            yield load_key(row), steppingpack.load(z_sql.t, data, identity), count
 
+
+@cache
+def _qry_get_by_key(
+    table_name: str,
+    identity_is_data: bool,
+    index: Index[Any, Any],
+    match: bool,
+) -> str:
     info = generic.index_info(TYPE_MAP, index)
     key_expression = ", ".join(info.columns)
     order_by_expression = ", ".join(info.columns_asc)
 
-    params: tuple[str, ...] = ()
     join_expression = ""
-    if not isinstance(match_keys, MatchAll):
+    if match:
         select_expression = ", ".join(to_each_value(index))
         on_expression = " AND ".join(f"{e} = __{i}" for i, e in enumerate(info.columns))
-        join_on = list[steppingpack.ValueJSON]()
-        for key in match_keys:
-            join_on.append(list(generic.dump_key(index, key)))
         join_expression = f"JOIN (SELECT {select_expression} FROM json_array_elements(%s)) AS _ ON {on_expression}"
-        params = (json.dumps(join_on),)
 
-    data_column = "identity" if z_sql.identity_is_data else "data"
-    qry = f"""
-        SELECT json_build_array({key_expression}) AS key, {data_column}, c
+    data_column = "identity" if identity_is_data else "data"
+    identity_column = "NULL" if identity_is_data else "identity"
+    return f"""
+        SELECT {key_expression}, {data_column}, c, {identity_column}
         FROM {table_name}
         {join_expression}
         ORDER BY {order_by_expression}
     """
 
-    with force_index_usage(z_sql.cur):
-        if MAKE_TEST_ASSERTIONS:
-            assert "Index Scan" in explain(z_sql.cur, qry, params)
-
-        for row in z_sql.cur.execute(qry, params):
-            key_data, data, count = row
-            if not index.is_composite:
-                key_data = key_data[0]
-            yield (
-                steppingpack.load(index.k, key_data),
-                steppingpack.load(z_sql.t, data),
-                count,
-            )
-
 
 def to_each_value(index: Index[Any, Indexable]) -> list[str]:
     field_expressions = list[str]()
@@ -217,3 +287,15 @@ def to_each_value(index: Index[Any, Indexable]) -> list[str]:
         field_expression = "(value #>> '{" + str(i) + "}')"
         field_expressions.append(f"{field_expression}::{t} AS __{i}")
     return field_expressions
+
+
+def _size(z_sql: ZSetPostgres[Any]) -> StateSize:
+    table_name = z_sql.table_name
+    qry = f"""
+        SELECT
+            (SELECT count(*) FROM {table_name}),
+            pg_table_size('{table_name}'),
+            pg_indexes_size('{table_name}')
+    """
+    [(rows, table_bytes, index_bytes)] = z_sql.cur.execute(qry)
+    return StateSize(rows, table_bytes, index_bytes)
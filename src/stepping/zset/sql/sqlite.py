@@ -3,8 +3,10 @@ from __future__ import annotations
 import json
 import pathlib
 import sqlite3
+import time
 from contextlib import contextmanager
 from dataclasses import dataclass
+from functools import cache
 from typing import Any, Iterator
 
 from stepping import steppingpack
@@ -14,6 +16,7 @@ from stepping.types import (
     Indexable,
     K,
     MatchAll,
+    StateSize,
     TSerializable,
     ZSet,
     batched,
@@ -29,6 +32,9 @@ TYPE_MAP = generic.TypeDBTypeMap(
     ),
 )
 
+# Each table uses around 20 distinct statements, `sqlite3` caches 128 by default
+CACHED_STATEMENTS = 1024
+
 
 @dataclass(eq=False)
 class ZSetSQLite(generic.ZSetSQL[TSerializable]):
@@ -50,10 +56,22 @@ class ZSetSQLite(generic.ZSetSQL[TSerializable]):
     ) -> Iterator[tuple[TSerializable, int]]:
         return _get_all(self, match)
 
+    def size(self) -> StateSize:
+        return _size(self)
+
+    def wait_til_time(self, frontier: int) -> None:
+        return _wait_til_time(self, frontier)
+
 
 @contextmanager
-def connection(db_url: pathlib.Path) -> Iterator[generic.ConnSQLite]:
-    conn = sqlite3.connect(str(db_url.absolute()))
+def connection(
+    db_url: pathlib.Path, check_same_thread: bool = True
+) -> Iterator[generic.ConnSQLite]:
+    conn = sqlite3.connect(
+        str(db_url.absolute()),
+        check_same_thread=check_same_thread,
+        cached_statements=CACHED_STATEMENTS,
+    )
     # conn = sqlite3.connect(str(db_url.absolute()), isolation_level=None)
     # These seem to cause the occasional IO error, so leaving for now
     # conn.execute("PRAGMA journal_mode = WAL")
@@ -105,6 +123,20 @@ def _create_data_table(z_sql: ZSetSQLite[Any]) -> None:
     z_sql.cur.connection.execute(f"INSERT INTO last_update VALUES ('{table_name}', 0)")
 
 
+def _wait_til_time(z_sql: ZSetSQLite[Any], frontier: int) -> None:
+    # data_version only changes when another connection commits, so is
+    # cheaper to poll than last_update
+    data_version = None
+    for sleep_secs in generic.SLEEP_SECS:
+        [(new_data_version,)] = z_sql.cur.execute("PRAGMA data_version")
+        if new_data_version != data_version:
+            if z_sql.has_reached_time(frontier):
+                return
+            data_version = new_data_version
+        time.sleep(sleep_secs)
+    raise RuntimeError(f"No changes committed from frontier: {frontier}")
+
+
 def _upsert(z_sql: ZSetSQLite[TSerializable], z: ZSet[TSerializable]) -> None:
     table_name = z_sql.table_name
 
@@ -122,44 +154,68 @@ def _upsert(z_sql: ZSetSQLite[TSerializable], z: ZSet[TSerializable]) -> None:
     if not values:
         return
 
-    qs = ", ".join("?" for _ in range(len(values[0])))
+    insert_qry, delete_qry = _qry_upsert(table_name, len(values[0]))
     for vs in batched(values, n=1000):
-        qry = f"""
-            INSERT INTO {table_name} VALUES ({qs})
-            ON CONFLICT (identity)
-            DO UPDATE SET
-                c = {table_name}.c + excluded.c
-        """
-        z_sql.cur.executemany(qry, vs)
-
-        qry = f"""
-            DELETE FROM {table_name}
-            WHERE identity IN (?)
-            AND c = 0
-        """
-        z_sql.cur.executemany(qry, [(v[0],) for v in vs])
+        z_sql.cur.executemany(insert_qry, vs)
+        z_sql.cur.executemany(delete_qry, [(v[0],) for v in vs])
+
+
+@cache
+def _qry_upsert(table_name: str, n_columns: int) -> tuple[str, str]:
+    qs = ", ".join("?" for _ in range(n_columns))
+    insert_qry = f"""
+        INSERT INTO {table_name} VALUES ({qs})
+        ON CONFLICT (identity)
+        DO UPDATE SET
+            c = {table_name}.c + excluded.c
+    """
+    delete_qry = f"""
+        DELETE FROM {table_name}
+        WHERE identity IN (?)
+        AND c = 0
+    """
+    return insert_qry, delete_qry
 
 
 def _get_all(
     z_sql: ZSetSQLite[TSerializable],
     match: frozenset[TSerializable] | MatchAll = MATCH_ALL,
 ) -> Iterator[tuple[TSerializable, int]]:
-    table_name = z_sql.table_name
-    data_column = "identity" if z_sql.identity_is_data else "data"
-
     if not isinstance(match, MatchAll):
         if z_sql.identity_is_data:
-            hex_strings = (steppingpack.dump(m).hex() for m in match)
+            identities = [steppingpack.dump(m) for m in match]
         else:
-            hex_strings = (steppingpack.make_identity(m).hex() for m in match)
-        identity_literals = ", ".join(f"x'{h}'" for h in hex_strings)
-        qry = f"SELECT {data_column}, c FROM {table_name} WHERE identity IN ({identity_literals})"
-        for data, c in z_sql.cur.execute(qry):
-            yield steppingpack.load(z_sql.t, data), c
+            identities = [steppingpack.make_identity(m) for m in match]
+        for params in _in_params(identities):
+            qry = _qry_get_all(z_sql.table_name, z_sql.identity_is_data, len(params))
+            for data, c, identity in z_sql.cur.execute(qry, params):
+                yield steppingpack.load(z_sql.t, data, identity), c
     else:
-        qry = f"SELECT {data_column}, c FROM {table_name}"
-        for data, c in z_sql.cur.execute(qry):
-            yield steppingpack.load(z_sql.t, data), c
+        qry = _qry_get_all(z_sql.table_name, z_sql.identity_is_data, None)
+        for data, c, identity in z_sql.cur.execute(qry):
+            yield steppingpack.load(z_sql.t, data, identity), c
+
+
+@cache
+def _qry_get_all(table_name: str, identity_is_data: bool, n_match: int | None) -> str:
+    data_column = "identity" if identity_is_data else "data"
+    identity_column = "NULL" if identity_is_data else "identity"
+    qry = f"SELECT {data_column}, c, {identity_column} FROM {table_name}"
+    if n_match is not None:
+        qry += f" WHERE identity IN ({', '.join('?' * n_match)})"
+    return qry
+
+
+# Match sets are looked up this many values at a time. Each chunk is padded
+# to a power of two with repeats, so only a few distinct queries are prepared
+# (and cached by `sqlite3`), however many values there are
+MAX_IN_PARAMS = 512
+
+
+def _in_params(values: list[bytes]) -> Iterator[list[bytes]]:
+    for chunk in batched(values, n=MAX_IN_PARAMS):
+        n = 1 << (len(chunk) - 1).bit_length()
+        yield chunk + [chunk[-1]] * (n - len(chunk))
 
 
 def _get_by_key(
@@ -167,44 +223,51 @@ def _get_by_key(
     index: Index[TSerializable, K],
     match_keys: frozenset[K] | MatchAll,
 ) -> Iterator[tuple[K, TSerializable, int]]:
-    table_name = z_sql.table_name
+    params: tuple[str, ...] = ()
+    if not isinstance(match_keys, MatchAll):
+        join_on = [list(generic.dump_key(index, key)) for key in match_keys]
+        params = (json.dumps(join_on),)
+    qry = _qry_get_by_key(
+        z_sql.table_name,
+        z_sql.identity_is_data,
+        index,
+        not isinstance(match_keys, MatchAll),
+    )
+
+    load_key = generic.key_codec(index).load
+    for row in z_sql.cur.execute(qry, params):
+        data, count, identity = row[-3:]
+        yield load_key(row), steppingpack.load(z_sql.t, data, identity), count
+
 
+@cache
+def _qry_get_by_key(
+    table_name: str,
+    identity_is_data: bool,
+    index: Index[Any, Any],
+    match: bool,
+) -> str:
     info = generic.index_info(TYPE_MAP, index)
     key_expression = ", ".join(info.columns)
     order_by_expression = ", ".join(info.columns_asc)
 
-    params: tuple[str, ...] = ()
     join_expression = ""
-    if not isinstance(match_keys, MatchAll):
+    if match:
         select_expression = ", ".join(to_each_value(index))
         on_expression = " AND ".join(f"{e} = __{i}" for i, e in enumerate(info.columns))
-        join_on = list[steppingpack.ValueJSON]()
-        for key in match_keys:
-            join_on.append(list(generic.dump_key(index, key)))
         join_expression = (
             f"JOIN (SELECT {select_expression} FROM json_each(?)) ON {on_expression}"
         )
-        params = (json.dumps(join_on),)
 
-    data_column = "identity" if z_sql.identity_is_data else "data"
-    qry = f"""
-        SELECT json_array({key_expression}) AS key, {data_column}, c
+    data_column = "identity" if identity_is_data else "data"
+    identity_column = "NULL" if identity_is_data else "identity"
+    return f"""
+        SELECT {key_expression}, {data_column}, c, {identity_column}
         FROM {table_name}
         {join_expression}
         ORDER BY {order_by_expression}
     """
 
-    for row in z_sql.cur.execute(qry, params):
-        key_data, data, count = row
-        key_data = json.loads(key_data)
-        if not index.is_composite:
-            key_data = key_data[0]
-        yield (
-            steppingpack.load(index.k, key_data),
-            steppingpack.load(z_sql.t, data),
-            count,
-        )
-
 
 def to_each_value(index: Index[Any, Indexable]) -> list[str]:
     field_expressions = list[str]()
@@ -213,3 +276,25 @@ def to_each_value(index: Index[Any, Indexable]) -> list[str]:
         field_expression = f"(value ->> '$[{i}]')"
         field_expressions.append(f"CAST({field_expression} AS {t}) AS __{i}")
     return field_expressions
+
+
+def _size(z_sql: ZSetSQLite[Any]) -> StateSize:
+    table_name = z_sql.table_name
+    [(rows,)] = z_sql.cur.execute(f"SELECT count(*) FROM {table_name}")
+    qry = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?"
+    index_names = [name for (name,) in z_sql.cur.execute(qry, (table_name,))]
+    try:
+        qry = "SELECT name, sum(pgsize) FROM dbstat WHERE name IN ({}) GROUP BY name"
+        qs = ", ".join("?" for _ in range(len(index_names) + 1))
+        page_sizes = dict(z_sql.cur.execute(qry.format(qs), (table_name, *index_names)))
+    except sqlite3.OperationalError:
+        # SQLite was compiled without the dbstat table, fallback to payload size
+        data_column = "identity" if z_sql.identity_is_data else "data"
+        qry = f"SELECT sum(length(identity) + length({data_column})) FROM {table_name}"
+        [(payload,)] = z_sql.cur.execute(qry)
+        return StateSize(rows, payload or 0, 0)
+    return StateSize(
+        rows=rows,
+        bytes=page_sizes.get(table_name, 0),
+        index_bytes=sum(page_sizes.get(name, 0) for name in index_names),
+    )
@@ -1,5 +1,10 @@
+import asyncio
+import contextlib
+import pathlib
+import random
+import time
 from dataclasses import dataclass
-from typing import Annotated, Any
+from typing import Annotated, Any, Sequence
 
 import pytest
 
@@ -7,8 +12,9 @@ import stepping as st
 from stepping import run
 from stepping.graph import write_png
 from stepping.types import EMPTY, Empty, Index, Pair, ZSet
+from stepping.zset import functions
 from stepping.zset.python import ZSetPython
-from tests.conftest import Conns
+from tests.conftest import DB_URL, Conns
 from tests.helpers import StoreMaker, store_ids, store_makers
 
 
@@ -804,3 +810,335 @@ def test_group_by_zset_2(request: Any, conns: Conns, store_maker: StoreMaker) ->
     actual = remove("cat")
     expected = ZSetPython({Pair(z("cat", "dog"), 3): 1, Pair(z("ca"), 2): 1})
     assert actual == expected
+
+
+@pytest.mark.parametrize("kind", ["postgres", "sqlite"])
+def test_write_behind(monkeypatch: Any, conns: Conns, kind: str) -> None:
+    graph = st.compile(_f_test_join)
+    store_python = st.StorePython.from_graph(graph)
+
+    with contextlib.ExitStack() as stack:
+        store: st.StoreSQL
+        if kind == "postgres":
+            write_conn = stack.enter_context(st.connection_postgres(DB_URL))
+            store = st.StorePostgres.from_graph(
+                conns.postgres, graph, create_tables=True, write_conn=write_conn
+            )
+        else:
+            [(_, __, path)] = conns.sqlite.execute("PRAGMA database_list")
+            write_conn_sqlite = stack.enter_context(
+                st.connection_sqlite(pathlib.Path(path), check_same_thread=False)
+            )
+            store = st.StoreSQLite.from_graph(
+                conns.sqlite, graph, create_tables=True, write_conn=write_conn_sqlite
+            )
+
+        # Slow the writes down, so reads have to overlay uncommitted changes
+        upsert = store._zset_cls.upsert
+
+        def slow_upsert(z: Any) -> None:
+            time.sleep(0.005)
+            upsert(z)
+
+        monkeypatch.setattr(store._zset_cls, "upsert", slow_upsert)
+
+        rng = random.Random(42)
+        lefts = [
+            Left(kind="cat", name=f"cat-{i}", sound_id=rng.randrange(5))
+            for i in range(30)
+        ]
+        rights = [Right(sound_id=i, sound=f"sound-{i}") for i in range(5)]
+        inserted = list[Left]()
+        for i in range(30):
+            if i < 5:
+                inputs = (ZSetPython[Left](), ZSetPython({rights[i]: 1}))
+            elif i % 4 == 0 and inserted:
+                removed = inserted.pop(rng.randrange(len(inserted)))
+                inputs = (ZSetPython({removed: -1}), ZSetPython[Right]())
+            else:
+                inserted.append(lefts[i])
+                inputs = (ZSetPython({lefts[i]: 1}), ZSetPython[Right]())
+            (actual,) = st.iteration(store, graph, inputs)
+            (expected,) = st.iteration(store_python, graph, inputs)
+            assert actual == expected
+
+        store.close()
+        fresh: st.StoreSQL
+        if kind == "postgres":
+            fresh = st.StorePostgres.from_graph(conns.postgres, graph, False)
+        else:
+            fresh = st.StoreSQLite.from_graph(conns.sqlite, graph, False)
+        for vertex in graph.delay_vertices:
+            assert fresh._current[vertex] == store_python._current[vertex]
+
+
+def test_write_behind_error(monkeypatch: Any, conns: Conns) -> None:
+    graph = st.compile(_f_test_join)
+    [(_, __, path)] = conns.sqlite.execute("PRAGMA database_list")
+    with st.connection_sqlite(pathlib.Path(path), check_same_thread=False) as conn:
+        store = st.StoreSQLite.from_graph(conns.sqlite, graph, True, write_conn=conn)
+
+        def failing_upsert(z: Any) -> None:
+            raise ValueError("Failed to write")
+
+        monkeypatch.setattr(store._zset_cls, "upsert", failing_upsert)
+        left = Left(kind="cat", name="cat", sound_id=1)
+        inputs = (ZSetPython({left: 1}), ZSetPython[Right]())
+        st.iteration(store, graph, inputs)
+        with pytest.raises(RuntimeError, match="Error writing behind"):
+            store.drain()
+        # Raised before anything is read
+        with pytest.raises(RuntimeError, match="Error writing behind"):
+            st.iteration(store, graph, inputs)
+        with pytest.raises(RuntimeError, match="Error writing behind"):
+            store.close()
+        store.close()  # already stopped
+
+
+def test_write_behind_context(conns: Conns) -> None:
+    graph = st.compile(_f_test_join)
+    [(_, __, path)] = conns.sqlite.execute("PRAGMA database_list")
+    left = Left(kind="cat", name="cat", sound_id=1)
+    right = Right(sound_id=1, sound="meow")
+    with st.connection_sqlite(pathlib.Path(path), check_same_thread=False) as conn:
+        with st.StoreSQLite.from_graph(conns.sqlite, graph, True, conn) as store:
+            st.iteration(store, graph, (ZSetPython({left: 1}), ZSetPython({right: 1})))
+        assert store._write_behind is None
+
+    fresh = st.StoreSQLite.from_graph(conns.sqlite, graph, False)
+    (actual,) = st.iteration(
+        fresh, graph, (ZSetPython[Left](), ZSetPython({right: -1}))
+    )
+    assert actual == ZSetPython({Pair(left, right): -1})
+
+
+@pytest.mark.parametrize("kind", ["python", "postgres", "sqlite"])
+def test_threaded(conns: Conns, kind: str) -> None:
+    graph = st.compile(_f_test_join)
+    store_python = st.StorePython.from_graph(graph)
+
+    with contextlib.ExitStack() as stack:
+        store: st.Store
+        if kind == "python":
+            store = st.StorePython.from_graph(graph)
+        elif kind == "postgres":
+            store = st.StorePostgres.from_graph(conns.postgres, graph, True)
+        else:
+            [(_, __, path)] = conns.sqlite.execute("PRAGMA database_list")
+            conn = stack.enter_context(
+                st.connection_sqlite(pathlib.Path(path), check_same_thread=False)
+            )
+            store = st.StoreSQLite.from_graph(conn, graph, True)
+
+        rng = random.Random(42)
+        rights = [Right(sound_id=i, sound=f"sound-{i}") for i in range(5)]
+        inserted = list[Left]()
+        for i in range(30):
+            left = Left(kind="cat", name=f"cat-{i}", sound_id=rng.randrange(5))
+            if i % 4 == 0 and inserted:
+                removed = inserted.pop(rng.randrange(len(inserted)))
+                inputs = (ZSetPython({removed: -1}), ZSetPython({rights[i % 5]: 1}))
+            else:
+                inserted.append(left)
+                inputs = (ZSetPython({left: 1}), ZSetPython[Right]())
+            with st.threaded(workers=2):
+                (actual,) = st.iteration(store, graph, inputs)
+            (expected,) = st.iteration(store_python, graph, inputs)
+            assert actual == expected
+
+
+def test_threaded_per_context() -> None:
+    assert run.THREADS.get() is None
+    with st.threaded(workers=2):
+        executor = run.THREADS.get()
+        assert executor is not None
+        # Other threads, eg. other `st.iteration_async(...)` calls, are unaffected
+        assert executor.submit(run.THREADS.get).result() is None
+        with st.threaded(workers=1):
+            assert run.THREADS.get() is not executor
+        assert run.THREADS.get() is executor
+    assert run.THREADS.get() is None
+
+
+@pytest.mark.parametrize("kind", ["python", "postgres", "sqlite"])
+def test_iteration_async(conns: Conns, kind: str) -> None:
+    graph = st.compile(_f_test_join)
+
+    with contextlib.ExitStack() as stack:
+        store: st.Store
+        if kind == "python":
+            store = st.StorePython.from_graph(graph)
+        elif kind == "postgres":
+            store = st.StorePostgres.from_graph(conns.postgres, graph, True)
+        else:
+            [(_, __, path)] = conns.sqlite.execute("PRAGMA database_list")
+            conn = stack.enter_context(
+                st.connection_sqlite(pathlib.Path(path), check_same_thread=False)
+            )
+            store = st.StoreSQLite.from_graph(conn, graph, True)
+
+        left, right = st.actions_async(store, graph)
+        lefts = [Left(kind="cat", name=f"cat-{i}", sound_id=i % 3) for i in range(9)]
+        rights = [Right(sound_id=i, sound=f"sound-{i}") for i in range(3)]
+
+        async def main() -> list[Any]:
+            await asyncio.gather(*(right.insert(r) for r in rights))
+            outs = await asyncio.gather(*(left.insert(l) for l in lefts))
+            (removed,) = await st.iteration_async(
+                store, graph, (ZSetPython({lefts[0]: -1}), ZSetPython[Right]())
+            )
+            return [*outs, removed]
+
+        *outs, removed = asyncio.run(main())
+        for l, (out,) in zip(lefts, outs):
+            assert out == ZSetPython({Pair(l, rights[l.sound_id]): 1})
+        assert removed == ZSetPython({Pair(lefts[0], rights[0]): -1})
+
+
+def times_three(n: int) -> int:
+    return n * 3
+
+
+def is_even(n: int) -> bool:
+    return n % 2 == 0
+
+
+def with_next(n: int) -> frozenset[int]:
+    return frozenset({n, n + 1})
+
+
+def _f_test_map_parallel(a: ZSet[int]) -> ZSet[int]:
+    mapped = st.map(a, f=times_three, parallel=2, chunk_size=10)
+    filtered = st.filter(mapped, f=is_even, parallel=2, chunk_size=10)
+    many = st.map_many(filtered, f=with_next, parallel=2, chunk_size=10)
+    return many
+
+
+def _f_test_map_serial(a: ZSet[int]) -> ZSet[int]:
+    mapped = st.map(a, f=times_three)
+    filtered = st.filter(mapped, f=is_even)
+    many = st.map_many(filtered, f=with_next)
+    return many
+
+
+def test_map_parallel() -> None:
+    graph_parallel = st.compile(_f_test_map_parallel)
+    graph_serial = st.compile(_f_test_map_serial)
+    store_parallel = st.StorePython.from_graph(graph_parallel)
+    store_serial = st.StorePython.from_graph(graph_serial)
+
+    for n in [5, 100]:  # below and above the chunk size
+        z = ZSetPython({i: i % 3 + 1 for i in range(n)})
+        (actual,) = st.iteration(store_parallel, graph_parallel, (z,))
+        (expected,) = st.iteration(store_serial, graph_serial, (z,))
+        assert actual == expected
+
+
+class SlottedRight(st.Data, slots=True):
+    sound_id: int
+    sound: str
+
+
+def as_rights(n: int) -> frozenset[Right | SlottedRight]:
+    return frozenset(
+        {Right(sound_id=n, sound=f"sound-{n}"), SlottedRight(sound_id=n, sound="s")}
+    )
+
+
+def as_sounds(n: int) -> ZSetPython[str]:
+    return ZSetPython({f"sound-{n}": 1, "sound": -1})
+
+
+def test_map_parallel_hashes() -> None:
+    # Hashes of str differ between processes, so mustn't come back cached
+    z = ZSetPython({i: 1 for i in range(20)})
+    pairs: list[tuple[ZSet[Any], ZSet[Any]]] = [
+        (
+            functions.map_many(z, as_rights, parallel=2, chunk_size=5),
+            functions.map_many(z, as_rights),
+        ),
+        (
+            functions.map(z, as_sounds, parallel=2, chunk_size=5),
+            functions.map(z, as_sounds),
+        ),
+    ]
+    for actual, expected in pairs:
+        assert isinstance(actual, ZSetPython)
+        assert actual == expected
+        for value, count in expected.iter():
+            assert actual.get_count(value) == count
+
+
+def times_three_batch(ns: Sequence[int]) -> list[str]:
+    return [str(n * 3) for n in ns]
+
+
+def is_even_batch(ns: Sequence[str]) -> list[bool]:
+    return [int(n) % 2 == 0 for n in ns]
+
+
+def _f_test_map_batch(a: ZSet[int]) -> ZSet[str]:
+    mapped = st.map_batch(a, f=times_three_batch)
+    filtered = st.filter_batch(mapped, f=is_even_batch)
+    return filtered
+
+
+def test_map_batch() -> None:
+    graph = st.compile(_f_test_map_batch)
+    assert graph.vertices[graph.output[0]].v == ZSet[str]
+    store = st.StorePython.from_graph(graph)
+
+    z = ZSetPython({i: i % 3 + 1 for i in range(10)})
+    (actual,) = st.iteration(store, graph, (z,))
+    assert actual == ZSetPython({str(i * 3): i % 3 + 1 for i in range(0, 10, 2)})
+
+    (actual,) = st.iteration(store, graph, (ZSetPython[int](),))
+    assert actual == ZSetPython[str]()
+
+    with pytest.raises(RuntimeError, match="expected one per row"):
+        functions.map_batch(z, lambda ns: ns[:1])
+
+
+class Read(st.Data):
+    meter_id: int
+    value: float
+
+
+@st.vectorisable
+def is_positive(read: Read) -> bool:
+    return read.value > 0
+
+
+@st.vectorisable
+def pick_value(read: Read) -> float:
+    return read.value
+
+
+def _f_test_columnar(
+    a: ZSet[Read],
+) -> tuple[ZSet[Pair[float, int]], ZSet[int]]:
+    positive = st.filter(a, f=is_positive)
+    summed = st.group_reduce_flatten(
+        positive,
+        by=st.Index.pick(Read, lambda r: r.meter_id),
+        zero=float,
+        pick_value=pick_value,
+    )
+    counted = st.count(positive)
+    return summed, counted
+
+
+@pytest.mark.parametrize("store_maker", store_makers, ids=store_ids)
+def test_columnar(request: Any, conns: Conns, store_maker: StoreMaker) -> None:
+    pytest.importorskip("numpy")
+    graph, store = store_maker(conns, _f_test_columnar)
+    store_python = st.StorePython.from_graph(graph)
+
+    for i in range(3):
+        z = ZSetPython(
+            {Read(meter_id=n % 4, value=float(n - 2 + i)): 1 for n in range(20)}
+        )
+        z_columnar = st.ZSetColumnar.from_zset(Read, z)
+        actual = st.iteration(store, graph, (z_columnar,))
+        expected = st.iteration(store_python, graph, (z,))
+        assert actual == expected
@@ -1,10 +1,12 @@
 import concurrent.futures
 import cProfile
+import pathlib
 import random
 import time
+from contextlib import contextmanager
 from datetime import date, datetime
 from pprint import pprint
-from typing import Any, Callable
+from typing import Any, Callable, Iterator
 from unittest.mock import ANY
 from uuid import UUID
 
@@ -344,6 +346,153 @@ def test_parallel(request: Any, postgres_conn: st.ConnPostgres) -> None:
         assert actual == [(date(2023, 1, 2), usage, 1)]
 
 
+@contextmanager
+def _postgres_store(graph: st.Graph[Any, Any]) -> Iterator[st.StoreSQL]:
+    with st.connection_postgres(DB_URL) as conn:
+        yield st.StorePostgres.from_graph(conn, graph, create_tables=False)
+
+
+def _f_test_run_parallel(reads: st.ZSet[HalfHourlyMeterRead]) -> st.ZSet[int]:
+    counted = st.count(reads)
+    return counted
+
+
+def value_or_fail(read: HalfHourlyMeterRead) -> float:
+    if read.value < 0:
+        raise ValueError("Negative read")
+    return read.value
+
+
+def _f_test_run_parallel_fail(
+    reads: st.ZSet[HalfHourlyMeterRead],
+) -> st.ZSet[float]:
+    values = st.map(reads, f=value_or_fail)
+    return values
+
+
+def test_run_parallel(postgres_conn: st.ConnPostgres) -> None:
+    graph = st.compile(_f_test_run_parallel)
+    store = st.StorePostgres.from_graph(postgres_conn, graph, create_tables=True)
+
+    r = random.Random(42)
+    reads = [make_random_read(r) for _ in range(200)]
+    chunks = [
+        (st.ZSetPython({read: 1 for read in chunk}),) for chunk in st.batched(reads, 20)
+    ]
+    ran = st.run_parallel(_f_test_run_parallel, _postgres_store, chunks, workers=3)
+    assert (ran.chunks, ran.rows, ran.retries) == (10, 200, 0)
+
+    (action,) = st.actions(store, graph)
+    (actual,) = action.insert(make_random_read(r))
+    assert actual == st.ZSetPython({200: -1, 201: 1})
+
+    bad_read = HalfHourlyMeterRead(
+        meter_id=meter_id_1, timestamp=datetime(2023, 1, 1), value=-1.0
+    )
+    with pytest.raises(ValueError):
+        st.run_parallel(
+            _f_test_run_parallel_fail,
+            _postgres_store,
+            [(st.ZSetPython({bad_read: 1}),)],
+            workers=1,
+            retries=1,
+        )
+
+
+@contextmanager
+def _python_store(graph: st.Graph[Any, Any], shard: int) -> Iterator[st.StorePython]:
+    yield st.StorePython.from_graph(graph)
+
+
+def _f_test_sharded(
+    reads: st.ZSet[HalfHourlyMeterRead],
+) -> st.ZSet[st.Pair[float, UUID]]:
+    summed = st.group_reduce_flatten(
+        reads,
+        by=st.Index.pick(HalfHourlyMeterRead, lambda r: r.meter_id),
+        zero=float,
+        pick_value=pick_read_value,
+    )
+    return summed
+
+
+def pick_read_value(read: HalfHourlyMeterRead) -> float:
+    return read.value
+
+
+def test_sharded() -> None:
+    graph = st.compile(_f_test_sharded)
+    store = st.StorePython.from_graph(graph)
+    by_meter = st.Index.pick(HalfHourlyMeterRead, lambda r: r.meter_id)
+
+    r = random.Random(42)
+    meter_ids = [UUID(int=i) for i in range(8)]
+    reads = [
+        HalfHourlyMeterRead(
+            meter_id=r.choice(meter_ids),
+            timestamp=datetime(2023, 1, 1, r.randint(0, 23), r.randint(0, 59)),
+            value=r.randint(0, 400) / 4,  # sums exactly, whatever the order
+        )
+        for _ in range(200)
+    ]
+    chunks = [
+        st.ZSetPython({read: 1 for read in chunk}) for chunk in st.batched(reads, 20)
+    ]
+
+    with st.sharded(_f_test_sharded, _python_store, (by_meter,), shards=3) as sharded:
+        for chunk in chunks:
+            (expected,) = st.iteration(store, graph, (chunk,))
+            (actual,) = sharded.iteration((chunk,))
+            assert actual == expected
+        assert sharded.iteration((st.ZSetPython(),)) == (st.ZSetPython(),)
+
+
+class NameTotal(st.Data):
+    name: str
+    total: int
+
+
+def _f_test_sharded_str(users: st.ZSet[User]) -> st.ZSet[NameTotal]:
+    summed = st.group_reduce_flatten(
+        users,
+        by=st.Index.pick(User, lambda u: u.name),
+        zero=int,
+        pick_value=pick_user_id,
+    )
+    totals = st.map(summed, f=as_name_total)
+    return totals
+
+
+def pick_user_id(user: User) -> int:
+    return user.user_id
+
+
+def as_name_total(p: st.Pair[int, str]) -> NameTotal:
+    return NameTotal(name=p.right, total=p.left)
+
+
+def test_sharded_str() -> None:
+    graph = st.compile(_f_test_sharded_str)
+    store = st.StorePython.from_graph(graph)
+    by_name = st.Index.pick(User, lambda u: u.name)
+
+    names = [f"name-{i}" for i in range(8)]
+    users = [User(user_id=i, name=names[i % 8]) for i in range(100)]
+    chunks = [
+        st.ZSetPython({user: 1 for user in chunk}) for chunk in st.batched(users, 20)
+    ]
+
+    with st.sharded(
+        _f_test_sharded_str, _python_store, (by_name,), shards=3
+    ) as sharded:
+        for chunk in chunks:
+            (expected,) = st.iteration(store, graph, (chunk,))
+            (actual,) = sharded.iteration((chunk,))
+            assert actual == expected
+            for row, count in expected.iter():
+                assert actual.get_count(row) == count
+
+
 def test_classic(postgres_conn: st.ConnPostgres | st.ConnSQLite, request: Any) -> None:
     qry = """
     CREATE TABLE user_ (
@@ -414,3 +563,104 @@ def test_classic(postgres_conn: st.ConnPostgres | st.ConnSQLite, request: Any) -
     print("\ntest_classic took:")
     print_time(pr)
     pprint(rows[:3])
+
+
+def test_collect_metrics(request: Any) -> None:
+    query = st.compile(_f_test_profile_1)
+    store = st.StorePython.from_graph(query)
+    i_users, i_meters, i_reads = st.actions(store, query)
+
+    i_users.insert(user_1)
+    i_meters.insert(meter_1)
+    with st.collect_metrics() as metrics:
+        i_reads.insert(*half_hourly_reads_1)
+
+    joins = [p for p, v in query.vertices.items() if v.operator_kind.value == "join"]
+    # one of the reads has no matching meter
+    assert sum(metrics[p].rows for p in joins) == len(half_hourly_reads_1) - 1
+    assert all(m.calls == 1 for m in metrics.values())
+
+    # Iterations in other threads aren't collected
+    with st.collect_metrics() as metrics_other:
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            executor.submit(i_reads.remove, *half_hourly_reads_1).result()
+    assert metrics_other == {}
+
+    explained = st.explain_analyze(query, metrics)
+    first, second, *_ = explained.splitlines()
+    assert first.startswith("Total: ")
+    assert second.startswith("-> map ")
+    assert "(see above)" in explained
+
+    if request.config.getoption("--write-graphs"):
+        st.write_png(query, "graphs/test_profile_1_metrics.png", metrics=metrics)
+
+
+@pytest.mark.parametrize("store_maker", store_makers, ids=store_ids)
+def test_sizes(request: Any, conns: Conns, store_maker: StoreMaker) -> None:
+    query, store = store_maker(conns, _f_test_profile_1)
+    assert isinstance(store, (st.StorePython, st.StoreSQL))
+    i_users, i_meters, i_reads = st.actions(store, query)
+
+    i_users.insert(user_1)
+    i_meters.insert(meter_1)
+    i_reads.insert(*half_hourly_reads_1)
+
+    sizes = store.sizes()
+    assert set(sizes) == set(query.delay_vertices)
+    assert sum(s.rows for s in sizes.values()) > 0
+    for vertex, size in sizes.items():
+        if size.rows:
+            assert size.bytes > 0
+        if vertex.indexes and size.rows:
+            assert size.index_bytes > 0
+
+    explained = st.explain_analyze(query, {}, sizes=sizes)
+    assert "(state=" in explained
+
+    if request.config.getoption("--write-graphs"):
+        st.write_png(query, "graphs/test_profile_1_sizes.png", sizes=sizes)
+
+
+def _f_test_record_other(reads: st.ZSet[HalfHourlyMeterRead]) -> st.ZSet[int]:
+    counted = st.count(reads)
+    return counted
+
+
+def test_record_and_replay(tmp_path: pathlib.Path, conns: Conns) -> None:
+    query = st.compile(_f_test_profile_1)
+    store = st.StorePython.from_graph(query)
+    i_users, i_meters, i_reads = st.actions(store, query)
+
+    path = tmp_path / "recording"
+    with st.record_inputs(path, query):
+        i_users.insert(user_1)
+        i_meters.insert(meter_1)
+    with st.record_inputs(path, query):
+        i_reads.insert(*half_hourly_reads_1[:3])
+        i_reads.remove(half_hourly_reads_1[0])
+        # Iterations in other threads aren't recorded
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            executor.submit(i_reads.insert, *half_hourly_reads_1[3:]).result()
+
+    # A partially written frame is ignored
+    with path.open("ab") as f:
+        f.write(b"\x00\x00\x01")
+
+    recorded = list(st.recording.read_recording(path, query))
+    assert [r.secs for r in recorded] == sorted(r.secs for r in recorded)
+
+    store_sqlite = st.StoreSQLite.from_graph(conns.sqlite, query, create_tables=True)
+    replayed = st.replay(path, store_sqlite, query)
+    assert replayed.iterations == 4
+    assert replayed.rows == 1 + 1 + 3 + 1
+
+    replayed_store = st.StorePython.from_graph(query)
+    st.replay(path, replayed_store, query, pace=True)
+    (actual,) = st.actions(replayed_store, query)[2].insert(*half_hourly_reads_1[3:])
+    (expected,) = st.actions(store_sqlite, query)[2].insert(*half_hourly_reads_1[3:])
+    assert actual == expected
+
+    other = st.compile(_f_test_record_other)
+    with pytest.raises(RuntimeError):
+        list(st.recording.read_recording(path, other))
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
 import subprocess
+import threading
+import time
+from dataclasses import replace
 from datetime import date, datetime, timezone
 from typing import Any
 
+import pytest
+
 from stepping.steppingpack import Data
 from stepping.types import Index, ZSet
 from stepping.zset import functions
 from stepping.zset.python import ZSetPython
 from stepping.zset.sql import generic, postgres
+from tests.conftest import DB_URL
 
 
 def _flush(z: generic.ZSetSQL[Any]) -> None:
@@ -65,6 +71,20 @@ def test_write_simple_int(postgres_conn: generic.ConnPostgres) -> None:
     assert actual == [(42, 1), (78, -1)]
 
 
+def test_iter_match_chunked(
+    postgres_conn: generic.ConnPostgres, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(postgres, "MAX_ANY_PARAMS", 4)
+    z = postgres.ZSetPostgres(postgres_conn.cursor(), str, "foo", ())
+    z.create_data_table()
+    z += ZSetPython({str(i): i for i in range(1, 20)})
+    _flush(z)
+
+    match = frozenset(str(i) for i in range(0, 30, 3))
+    actual = sorted(z.iter(match), key=lambda vc: vc[1])
+    assert actual == [(str(i), i) for i in range(3, 20, 3)]
+
+
 def test_write_simple_int_with_index(postgres_conn: generic.ConnPostgres) -> None:
     cur = postgres_conn.cursor()
     z = postgres.ZSetPostgres(cur, int, "foo", (Index.identity(int),))
@@ -308,3 +328,43 @@ def test_schema_made_and_used(postgres_conn: generic.ConnPostgres) -> None:
         ("some-name-2", "pi-2"),
         ("some-name-2", "pi-20"),
     ]
+
+
+def test_wait_til_time(postgres_conn: generic.ConnPostgres) -> None:
+    z = postgres.ZSetPostgres[int](postgres_conn.cursor(), int, "foo", ())
+    z.create_data_table()
+    bar = replace(z, table_name="bar")
+    bar.create_data_table()
+    postgres_conn.commit()
+
+    def write_later() -> None:
+        time.sleep(0.1)
+        with postgres.connection(DB_URL) as conn:
+            replace(z, cur=conn.cursor()).set_last_update_time(1)
+            conn.commit()
+
+    thread = threading.Thread(target=write_later)
+    thread.start()
+    bar.set_last_update_time(1)  # left uncommitted by waiting
+    before = time.monotonic()
+    z.wait_til_time(1)
+    assert time.monotonic() - before >= 0.1
+    assert z.has_reached_time(1)
+    thread.join()
+    postgres_conn.rollback()
+    assert not bar.has_reached_time(1)
+
+
+def test_wait_til_time_timeout(
+    postgres_conn: generic.ConnPostgres, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(generic, "MAX_WAIT_SECS", 0.05)
+    z = postgres.ZSetPostgres[int](postgres_conn.cursor(), int, "foo", ())
+    z.create_data_table()
+    postgres_conn.commit()
+
+    with pytest.raises(RuntimeError, match="No changes committed"):
+        z.wait_til_time(1)
+    assert list(postgres_conn.execute("SELECT pg_listening_channels()")) == []
+    qry = "SELECT count(*) FROM pg_stat_activity WHERE query LIKE 'LISTEN%'"
+    assert list(postgres_conn.execute(qry)) == [(0,)]
@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+import pathlib
 import subprocess
+import threading
+import time
+from dataclasses import replace
 from datetime import date, datetime, timezone
+from enum import Enum
 from typing import Any
+from uuid import UUID
 
+import pytest
+
+from stepping import steppingpack
 from stepping.steppingpack import Data
 from stepping.types import Index, ZSet
 from stepping.zset import functions
@@ -63,6 +72,25 @@ def test_write_simple_int(sqlite_conn: generic.ConnSQLite) -> None:
     assert actual == [(42, 1), (78, -1)]
 
 
+def test_iter_match_chunked(
+    sqlite_conn: generic.ConnSQLite, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(sqlite, "MAX_IN_PARAMS", 4)
+    z = sqlite.ZSetSQLite(sqlite_conn.cursor(), str, "foo", ())
+    z.create_data_table()
+    z += ZSetPython({str(i): i for i in range(1, 20)})
+    _flush(z)
+
+    match = frozenset(str(i) for i in range(0, 30, 3))
+    actual = sorted(z.iter(match), key=lambda vc: vc[1])
+    assert actual == [(str(i), i) for i in range(3, 20, 3)]
+
+    # Chunks of 4, 4 and 1, so only two distinct queries are made
+    sqlite._qry_get_all.cache_clear()
+    list(z.iter(frozenset(str(i) for i in range(9))))
+    assert sqlite._qry_get_all.cache_info().currsize == 2
+
+
 def test_write_simple_int_with_index(sqlite_conn: generic.ConnSQLite) -> None:
     cur = sqlite_conn.cursor()
     z = sqlite.ZSetSQLite(cur, int, "foo", (Index.identity(int),))
@@ -108,6 +136,47 @@ def test_write_simple_date_with_index(sqlite_conn: generic.ConnSQLite) -> None:
     assert "CREATE INDEX ix__foo__identity ON foo(ixd__identity__identity)" in schema
 
 
+def test_key_codec(sqlite_conn: generic.ConnSQLite) -> None:
+    class Colour(Enum):
+        red = "red"
+
+    key: tuple[Any, ...] = (
+        "a",
+        1,
+        1.5,
+        True,
+        date(2021, 1, 3),
+        datetime(2021, 1, 3, 4, 5, 6, 7),
+        datetime(2021, 1, 3, tzinfo=timezone.utc),
+        UUID(int=1),
+        Colour.red,
+    )
+    k: Any = tuple[str, int, float, bool, date, datetime, datetime, UUID, Colour]
+    names = tuple(str(i) for i in range(len(key)))
+    index = Index.composite(names, k, k, lambda v: v)
+    codec = generic.key_codec(index)
+    assert codec.dump(key) == tuple(steppingpack.dump_indexable(v) for v in key)
+    assert codec.load(codec.dump(key) + ("data", 1, None)) == key
+
+    index_atom = Index.identity(datetime)
+    codec = generic.key_codec(index_atom)
+    assert codec.dump(key[5]) == (steppingpack.dump_indexable(key[5]),)
+    assert codec.load(codec.dump(key[5])) == key[5]
+
+    z = sqlite.ZSetSQLite(
+        sqlite_conn.cursor(),
+        datetime,
+        "foo",
+        (index_atom,),
+    )
+    z.create_data_table()
+    z += ZSetPython({key[5]: 1, key[6]: 2})
+    _flush(z)
+    assert list(z.iter_by_index(index_atom, frozenset([key[6]]))) == [
+        (key[6], key[6], 2)
+    ]
+
+
 def test_write_complex(sqlite_conn: generic.ConnSQLite) -> None:
     cur = sqlite_conn.cursor()
     z = sqlite.ZSetSQLite(cur, Animal, "foo", ())
@@ -337,3 +406,45 @@ def test_iter_is_sorted(sqlite_conn: generic.ConnSQLite) -> None:
         ((3, _make_dt(2)), _make_animal(3, 2), 1),
     ]
     assert actual == expected
+
+
+def test_iter_by_index_match_keys_changes(sqlite_conn: generic.ConnSQLite) -> None:
+    cur = sqlite_conn.cursor()
+    index = Index.pick(Animal, lambda a: a.age)
+    z = sqlite.ZSetSQLite(cur, Animal, "foo", (index,))
+    z.create_data_table()
+
+    z += ZSetPython({_make_animal(1, 1): 1})
+    z += ZSetPython({_make_animal(2, 1): 1})
+    _flush(z)
+    z += ZSetPython({_make_animal(1, 2): 1})
+    z += ZSetPython({_make_animal(2, 2): 1})
+
+    actual = list(z.iter_by_index(index, frozenset({1})))
+    expected = [
+        (1, _make_animal(1, 1), 1),
+        (1, _make_animal(1, 2), 1),
+    ]
+    assert actual == expected
+
+
+def test_wait_til_time(sqlite_conn: generic.ConnSQLite) -> None:
+    [(_, __, path_str)] = sqlite_conn.execute("PRAGMA database_list")
+    path = pathlib.Path(path_str)
+    z = sqlite.ZSetSQLite[int](sqlite_conn.cursor(), int, "foo", ())
+    z.create_data_table()
+    sqlite_conn.commit()
+
+    def write_later() -> None:
+        time.sleep(0.1)
+        with sqlite.connection(path) as conn:
+            replace(z, cur=conn.cursor()).set_last_update_time(1)
+            conn.commit()
+
+    thread = threading.Thread(target=write_later)
+    thread.start()
+    before = time.monotonic()
+    z.wait_til_time(1)
+    assert time.monotonic() - before >= 0.1
+    assert z.has_reached_time(1)
+    thread.join()
@@ -1,11 +1,14 @@
 import enum
+import hashlib
+import pickle
 from datetime import UTC, date, datetime
 from uuid import UUID
 
+import ormsgpack
 import pytest
 
 from stepping import steppingpack
-from stepping.types import Pair
+from stepping.types import Index, Pair
 from stepping.zset.python import ZSetPython
 
 
@@ -204,7 +207,55 @@ def test_make_schema_union_error() -> None:
 
 def test_hash() -> None:
     d = DataB(x=42, many=(DataA(a="3"), DataA(a="4")))
-    hash(d)
+    assert hash(d) == hash(DataB(x=42, many=(DataA(a="3"), DataA(a="4"))))
+    assert "_st_bytes" not in d.__dict__  # computed lazily
+
+    assert d.st_bytes == steppingpack.dump(d)
+    assert d.st_identifier == hashlib.md5(d.st_bytes).digest()
+    assert d.st_bytes is d.st_bytes
+
+
+def test_dump_frozenset_partly_cached() -> None:
+    a1, a2 = DataA(a="1"), DataA(a="2")
+    expected = steppingpack.dump(frozenset({DataA(a="1"), DataA(a="2")}))
+    a1.st_bytes
+    assert steppingpack.dump(frozenset({a1, a2})) == expected
+
+    p1, p2 = Pair(1, "a"), Pair(2, "b")
+    expected = steppingpack.dump(frozenset({Pair(1, "a"), Pair(2, "b")}))
+    p1.st_bytes
+    assert steppingpack.dump(frozenset({p1, p2})) == expected
+
+
+def test_dump_nested_cached() -> None:
+    inner = Pair(DataA(a="1"), DataA(a="2"))
+    outer = Pair(inner, DataA(a="3"))
+    expected = steppingpack.dump(Pair(Pair(DataA(a="1"), DataA(a="2")), DataA(a="3")))
+    assert steppingpack.dump(outer) == expected
+    # Nested values aren't walked again
+    assert steppingpack.dump_python(outer)[0] is steppingpack.dump_python(inner)  # type: ignore[index]
+    assert steppingpack.dump(Pair(inner, DataA(a="3"))) == expected
+
+
+def test_cached_bytes() -> None:
+    pair = Pair(DataA(a="3"), Pair(4, "5"))
+    uncached = ormsgpack.packb(
+        (steppingpack.dump_python(DataA(a="3")), (4, "5")),
+        option=ormsgpack.OPT_UTC_Z,
+    )
+    assert pair.st_bytes == uncached
+    assert pair.st_bytes is pair.st_bytes
+    assert steppingpack.make_identity(pair) == hashlib.md5(uncached).digest()
+    assert pair == Pair(DataA(a="3"), Pair(4, "5"))
+
+    z = ZSetPython({DataA(a="3"): 1, DataA(a="4"): 2})
+    assert steppingpack.dump(z) == z.st_bytes
+    # new ZSets don't share the cached bytes
+    for changed in [z + ZSetPython({DataA(a="4"): 1}), -z, z * 2]:
+        fresh = ZSetPython(dict(changed.iter()))
+        assert steppingpack.dump(changed) == steppingpack.dump(fresh)
+        assert changed.st_bytes != z.st_bytes
+    assert steppingpack.load(ZSetPython[DataA], z.st_bytes) == z
 
 
 def thereandback(t: type[steppingpack.TValue], o: steppingpack.TValue) -> None:
@@ -294,3 +345,89 @@ def test_recursive() -> None:
     serialized = steppingpack.serialize_schema(schema)
     back_out = steppingpack.deserialize_schema(serialized)
     assert schema == back_out
+
+
+class DataH(steppingpack.Data):
+    a: str
+    b: int = 0
+
+
+def test_make_loader() -> None:
+    d = DataG(a=(DataG(a=()), DataG(a=(DataG(a=()),))))
+    o = ormsgpack.unpackb(steppingpack.dump(d))
+    assert steppingpack.make_loader(DataG)(o) == d
+    assert steppingpack.make_loader(DataG)(o) == steppingpack._load(
+        steppingpack.make_schema(DataG), o
+    )
+
+    e = DataE(
+        a="a",
+        b=42,
+        c=54.0,
+        d=None,
+        e=date(2021, 5, 6),
+        f=datetime(2021, 5, 6, tzinfo=UTC),
+        g=UUID("4c6c2692-6731-426d-b2c0-d08e672c8678"),
+        h=EnumA.two,
+        i=DataD(d="d"),
+        j=DataB(x=42, many=(DataA(a="3"), DataA(a="4"))),
+        k=(DataC(c="ddd"),),
+        l=frozenset(("str-4", "str-5")),
+        m=frozenset((DataB(x=42, many=(DataA(a="3"),)),)),
+        n=ZSetPython({3.14: 4, 2.0: -1}),
+        o=Pair("ssss", date(2012, 2, 3)),
+    )
+    loaded = steppingpack.load(DataE, steppingpack.dump(e))
+    assert loaded == e
+    assert loaded.j.st_bytes == e.j.st_bytes
+    assert steppingpack.load(tuple[DataA, ...], [["x"], ["y"]]) == (
+        DataA(a="x"),
+        DataA(a="y"),
+    )
+
+    # Rows from before a field with a default was added
+    assert steppingpack.load(DataH, ["a"]) == DataH(a="a")
+
+
+def test_load_reuses_bytes() -> None:
+    d = DataB(x=42, many=(DataA(a="3"), DataA(a="4")))
+    loaded = steppingpack.load(DataB, d.st_bytes)
+    assert loaded == d
+    assert loaded.st_bytes is d.st_bytes
+    assert (loaded.st_hash, loaded.st_identifier) == (d.st_hash, d.st_identifier)
+    # Nested Data have their bytes repacked, these match a fresh dump
+    assert loaded.many[0].st_bytes == DataA(a="3").st_bytes
+
+    loaded = steppingpack.load(DataB, d.st_bytes, identity=b"given")
+    assert loaded.st_identifier == b"given"
+
+
+class DataSlots(steppingpack.Data, slots=True):
+    a: str
+    b: tuple[DataA, ...]
+    c: int = 3
+
+
+class DataSlotsChild(DataSlots, slots=True):
+    d: date
+
+
+def test_slots() -> None:
+    d = DataSlots(a="a", b=(DataA(a="3"),))
+    assert not hasattr(d, "__dict__")
+    assert d.c == 3
+    assert d == DataSlots(a="a", b=(DataA(a="3"),), c=3)
+    assert hash(d) == hash(DataSlots(a="a", b=(DataA(a="3"),), c=3))
+    thereandback(DataSlots, d)
+    loaded = steppingpack.load(DataSlots, d.st_bytes)
+    assert loaded.st_bytes is d.st_bytes
+
+    child = DataSlotsChild(a="a", b=(), d=date(2023, 1, 2))
+    assert not hasattr(child, "__dict__")
+    assert getattr(DataSlotsChild, "__slots__") == ("d",)
+    thereandback(DataSlotsChild, child)
+    assert pickle.loads(pickle.dumps(child)) == child
+
+    index = Index.pick(DataSlotsChild, lambda r: (r.a, r.d))
+    assert index.names == ("a", "d")
+    assert index.f(child) == ("a", date(2023, 1, 2))
@@ -88,3 +88,33 @@ def test_pick_7() -> None:
         ("right.0", "right.1"), (True, True), ANY, types.Pair[int, tuple[str, float]], tuple[str, float], True  # type: ignore
     )
     assert actual == expected
+
+
+def test_pick_getter() -> None:
+    tom = Cat(name="tom", age=3, child=Cat(name="kit", age=1, child=None))  # type: ignore[arg-type]
+    pair = types.Pair(tom, ("a", 1.5))
+
+    index = types.Index.pick(types.Pair[Cat, tuple[str, float]], lambda p: p.left.age)
+    assert index.paths == (("left", "age"),)
+    assert index.f(pair) == 3
+    assert index.keys([pair, pair]) == [3, 3]
+
+    def f(p: types.Pair[Cat, tuple[str, float]]) -> tuple[str, float, str]:
+        return p.left.name, p.right[1], p.left.child.name
+
+    index_composite = types.Index.pick(types.Pair[Cat, tuple[str, float]], f)
+    assert index_composite.paths == (
+        ("left", "name"),
+        ("right", 1),
+        ("left", "child", "name"),
+    )
+    assert index_composite.f(pair) == f(pair) == ("tom", 1.5, "kit")
+
+    index_tuple = types.Index.pick(
+        types.Pair[Cat, tuple[str, float]], lambda p: p.right
+    )
+    assert index_tuple.f(pair) == ("a", 1.5)
+    index_one = types.Index.pick(
+        types.Pair[Cat, tuple[str, float]], lambda p: (p.right[0],)
+    )
+    assert index_one.f(pair) == ("a",)
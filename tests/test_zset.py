@@ -1,7 +1,12 @@
 from dataclasses import dataclass
 
+import pytest
+
+import stepping as st
+from stepping.operators import group, lifted
 from stepping.types import Index, Pair, Reducable, T, ZSet
 from stepping.zset import functions
+from stepping.zset.columnar import ZSetColumnar
 from stepping.zset.python import ZSetPython
 
 
@@ -90,3 +95,156 @@ def test_first_n() -> None:
     actual = list(functions._first_n(iter([(1, 1), (2, 4), (3, 1), (4, 1)]), 3))
     expected = [(1, 1), (2, 2)]
     assert actual == expected
+
+
+class Read(st.Data):
+    meter_id: int
+    value: float
+
+
+def test_shutdown_pools() -> None:
+    z = ZSetPython({1: 1, 2: 1, 3: 1})
+    actual = functions.map(z, str, parallel=2, chunk_size=1)
+    assert actual == ZSetPython({"1": 1, "2": 1, "3": 1})
+    pool = functions._POOLS[2]
+    functions.shutdown_pools()
+    assert functions._POOLS == {}
+    with pytest.raises(RuntimeError):
+        pool.submit(str, 1)
+
+
+def test_columnar() -> None:
+    pytest.importorskip("numpy")
+    z = ZSetPython(
+        {
+            Read(meter_id=1, value=1.5): 2,
+            Read(meter_id=2, value=-1.0): 1,
+            Read(meter_id=1, value=3.0): -1,
+        }
+    )
+    columnar = ZSetColumnar.from_zset(Read, z)
+    assert columnar == z
+    assert (columnar + -columnar).to_python() == ZSetPython[Read]()
+    assert columnar + ZSetPython({Read(meter_id=2, value=-1.0): -1}) == ZSetPython(
+        {Read(meter_id=1, value=1.5): 2, Read(meter_id=1, value=3.0): -1}
+    )
+
+    filtered = functions.filter(columnar, st.vectorisable(lambda r: r.value > 0))
+    assert isinstance(filtered, ZSetColumnar)
+    assert filtered == ZSetPython(
+        {Read(meter_id=1, value=1.5): 2, Read(meter_id=1, value=3.0): -1}
+    )
+    # Not marked, so called per row
+    filtered = functions.filter(columnar, lambda r: r.value > 0 and r.meter_id == 1)
+    assert not isinstance(filtered, ZSetColumnar)
+    assert filtered == ZSetPython(
+        {Read(meter_id=1, value=1.5): 2, Read(meter_id=1, value=3.0): -1}
+    )
+
+    doubled = columnar.vectorised(st.vectorisable(lambda r: r.value * 2))
+    assert sorted(doubled.tolist()) == [-2.0, 3.0, 6.0]  # type: ignore[union-attr]
+    assert columnar.vectorised(lambda r: r.value * 2) is None
+    with pytest.raises(AttributeError):
+        columnar.vectorised(st.vectorisable(lambda r: r.missing))
+    with pytest.raises(RuntimeError, match="one value per row"):
+        columnar.vectorised(st.vectorisable(lambda r: len(r.value)))
+
+    by = Index.pick(Read, lambda r: r.meter_id)
+    assert sorted(columnar.index_column(by).tolist()) == [1, 1, 2]  # type: ignore[union-attr]
+    by_both = Index.pick(Read, lambda r: (r.meter_id, r.value))
+    assert columnar.index_column(by_both) is None
+
+    ints = ZSetColumnar[int].from_zset(int, ZSetPython({1: 1, 2: 3}))
+    is_even = st.vectorisable(lambda n: n % 2 == 0)
+    assert functions.filter(ints, is_even) == ZSetPython({2: 3})
+
+
+def _pick_value(r: Read) -> float:
+    return r.value
+
+
+def test_columnar_cancelling() -> None:
+    pytest.importorskip("numpy")
+    x = Read(meter_id=1, value=1.5)
+    y = Read(meter_id=2, value=2.0)
+    columnar = ZSetColumnar.from_iter(Read, [(x, 1), (x, -1), (y, 1)])
+    python = ZSetPython({y: 1})
+    assert not columnar.empty()
+    assert ZSetColumnar.from_iter(Read, [(x, 1), (x, -1)]).empty()
+
+    by = Index.pick(Read, lambda r: r.meter_id)
+    grouped = group.group(columnar, by=by)
+    assert [k for _, k in grouped.iter()] == [2]
+    assert list(grouped.iter()) == list(group.group(python, by=by).iter())
+
+    zs: list[ZSet[Read]] = [columnar, python]
+    for z in zs:
+        assert lifted._f_sum(float, _pick_value, z) == 2.0
+        assert lifted._f_count(z) == 1
+
+
+class Tagged(st.Data):
+    name: str | None
+    tags: tuple[str, ...]
+
+
+def test_columnar_objects() -> None:
+    pytest.importorskip("numpy")
+    x = Tagged(name=None, tags=("a", "b"))
+    y = Tagged(name="y", tags=("a",))
+    z = Tagged(name="z", tags=())
+    columnar = ZSetColumnar.from_iter(Tagged, [(x, 2), (y, 1), (y, -1), (z, 1)])
+    python = ZSetPython({x: 2, z: 1})
+    assert columnar == python
+    assert len(columnar.consolidated()) == 2
+    # Tuples of one length aren't made into a 2-D array
+    w = Tagged(name="w", tags=("b",))
+    assert ZSetColumnar.from_iter(Tagged, [(y, 1), (w, 1)]) == ZSetPython({y: 1, w: 1})
+    assert not columnar.empty()
+
+    for by in [
+        Index.pick(Tagged, lambda t: t.name),
+        Index.pick(Tagged, lambda t: t.tags),
+    ]:
+        grouped = group.group(columnar, by=by)
+        expected = group.group(python, by=by)
+        assert {k: v for v, k in grouped.iter()} == {k: v for v, k in expected.iter()}
+
+
+def test_hash() -> None:
+    a = ZSetPython({1: 2, 2: -1})
+    b = ZSetPython({2: -1}) + ZSetPython({1: 1}) + ZSetPython({1: 1})
+    assert a == b
+    assert hash(a) == hash(b)
+    assert hash(-a) == hash(ZSetPython({1: -2, 2: 1}))
+    assert hash(a * 3) == hash(ZSetPython({1: 6, 2: -3}))
+    assert hash(a + -a) == hash(ZSetPython[int]())
+    assert len({a, b, a * 3}) == 2
+
+    c = ZSetPython[int]()
+    c -= a
+    assert hash(c) == hash(-a)
+
+    # Would collide if the hash was linear in the values
+    assert hash(ZSetPython({1: 2})) != hash(ZSetPython({2: 1}))
+    assert hash(ZSetPython({0: 3})) != hash(ZSetPython[int]())
+
+
+def test_scale() -> None:
+    a = ZSetPython[int](indexes=(Index.identity(int),))
+    a += ZSetPython({1: 4, 2: -2})
+    negged = -a
+    assert negged._data is a._data  # not copied
+    assert list(negged.iter()) == [(1, -4), (2, 2)]
+    assert negged.get_count(1) == -4
+    assert list(negged.iter_by_index(Index.identity(int))) == [(1, 1, -4), (2, 2, 2)]
+
+    assert negged + ZSetPython({1: 4, 3: 1}) == ZSetPython({2: 2, 3: 1})
+    assert ZSetPython({1: 4, 3: 1}) + negged == ZSetPython({2: 2, 3: 1})
+    assert (a * 3) + ZSetPython({1: 1}) == ZSetPython({1: 13, 2: -6})
+    assert -(a * 3) == ZSetPython({1: -12, 2: 6})
+    assert a * -1 == negged
+
+    subbed = -a
+    subbed -= ZSetPython({1: -4})
+    assert subbed == ZSetPython({2: 2})